@@ -0,0 +1,105 @@
+"""
+Transitions appended and minibatches sampled per second by ExperienceStore
+
+python -m benchmarks.experience
+"""
+import argparse
+import multiprocessing as mp
+import shutil
+import tempfile
+import time
+import numpy as np
+from game_engine.experienceStore import ExperienceStore
+
+# Like the observations of SuikaEnv
+OBSERVATION_SHAPE = (128, 6)
+
+
+def Transitions(count):
+    observation = np.random.default_rng(0).random((count,) + OBSERVATION_SHAPE)
+    return (
+        observation.astype(np.float32),
+        np.zeros(count, dtype=np.float32),
+        np.ones(count, dtype=np.float32),
+        np.zeros(count, dtype=bool),
+        observation.astype(np.float32),
+    )
+
+
+def _Writer(directory, batch, batches, start):
+    store = ExperienceStore(directory)
+    transitions = Transitions(batch)
+    start.wait()
+    for i in range(batches):
+        store.Append(*transitions)
+
+
+def MeasureAppends(directory, batch, batches, processes):
+    """
+    Transitions per second appended by processes writers together
+    """
+    start = mp.Event()
+    writers = [
+        mp.Process(target=_Writer, args=(directory, batch, batches, start))
+        for i in range(processes)
+    ]
+    for writer in writers:
+        writer.start()
+    time.sleep(0.5)  # Let them open the store
+
+    begin = time.perf_counter()
+    start.set()
+    for writer in writers:
+        writer.join()
+    return processes * batch * batches / (time.perf_counter() - begin)
+
+
+def MeasureSamples(sample, duration):
+    count = 0
+    begin = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        sample()
+        count += 1
+        elapsed = time.perf_counter() - begin
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=20000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--transitions", type=int, default=20000)
+    parser.add_argument("--sample-batch", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=1.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="experience")
+    try:
+        store = ExperienceStore.Create(directory, args.capacity, OBSERVATION_SHAPE)
+        for batch in args.batch:
+            for processes in args.processes:
+                batches = max(1, args.transitions // (batch * processes))
+                rate = MeasureAppends(directory, batch, batches, processes)
+                print(
+                    "append batch {:4d}, {} processes : {:10.0f} transitions/s".format(
+                        batch, processes, rate
+                    )
+                )
+
+        size = args.sample_batch
+        uniform = MeasureSamples(lambda: store.Sample(size), args.duration)
+        prioritized = MeasureSamples(
+            lambda: store.SamplePrioritized(size), args.duration
+        )
+        print(
+            "sample batch {} : uniform {:8.1f} batches/s, prioritized {:8.1f} "
+            "batches/s".format(size, uniform, prioritized)
+        )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
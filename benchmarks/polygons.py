@@ -0,0 +1,94 @@
+"""
+Memory used by polygons, alone and added to a World
+
+python -m benchmarks.polygons --output results.json
+python -m benchmarks.polygons --compare results.json
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from common.math import Vec2
+from common.shape import Polygon
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+
+def MakePolygons(count, kinds, seed=0):
+    """
+    count polygons drawn among kinds different boxes and triangles
+    """
+    rng = random.Random(seed)
+    sizes = [(rng.uniform(5, 30), rng.uniform(5, 30)) for _ in range(kinds)]
+    polygons = []
+    for i in range(count):
+        hw, hh = sizes[rng.randrange(kinds)]
+        polygon = Polygon()
+        if i % 2 == 0:
+            polygon.SetBox(hw, hh)
+        else:
+            polygon.Set([Vec2(-hw, hh), Vec2(hw, hh), Vec2(0, -hh)], 3)
+        polygons.append(polygon)
+    return polygons
+
+
+def Measure(build):
+    """
+    Bytes still allocated by the result of build
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def BuildWorld(count, kinds, seed=0):
+    world = World(1.0 / 60.0, 10, SweepAndPrune(), seed=seed)
+    rng = random.Random(seed)
+    for polygon in MakePolygons(count, kinds, seed):
+        world.add(polygon, rng.uniform(0, 800), rng.uniform(0, 600))
+    return world
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--kinds", type=int, default=10, help="different shapes")
+    parser.add_argument("--output", help="write the results as json")
+    parser.add_argument("--compare", help="json results to compare with")
+    args = parser.parse_args()
+
+    results = {
+        "count": args.count,
+        "kinds": args.kinds,
+        "polygons_bytes": Measure(lambda: MakePolygons(args.count, args.kinds)),
+        "world_bytes": Measure(lambda: BuildWorld(args.count, args.kinds)),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    for name in ("polygons_bytes", "world_bytes"):
+        line = "{:15s} {:12d} bytes {:8.1f} bytes/polygon".format(
+            name, results[name], results[name] / args.count
+        )
+        if baseline is not None:
+            line += "  baseline {:8.1f} bytes/polygon, {:.2f}x".format(
+                baseline[name] / baseline["count"],
+                baseline[name] / baseline["count"] * args.count / results[name],
+            )
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Frame time of the Renderer, full redraw against dirty rects
+
+python -m benchmarks.rendering
+"""
+import argparse
+import os
+import random
+import time
+
+# No window needed to measure the drawing
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame as pg
+from game_engine.fruit import DROP_TIERS
+from game_engine.stats import StepStats
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+from visualization.renderer import Renderer
+
+WIDTH = 800
+HEIGHT = 600
+
+
+def Build(fruits, seed=0):
+    rng = random.Random(seed)
+    world = World(1.0 / 60.0, 10, SweepAndPrune(), seed=seed)
+    world.add_container(WIDTH, HEIGHT)
+    for i in range(fruits):
+        x = rng.uniform(20, WIDTH - 20)
+        world.add_fruit(rng.randrange(DROP_TIERS), x, rng.uniform(0, HEIGHT))
+    return world
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fruits", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--debug", action="store_true", help="draw the control panel")
+    args = parser.parse_args()
+
+    for fruits in args.fruits:
+        world = Build(fruits)
+        world.debugMode = args.debug
+        # Let the pile settle, then a fruit is dropped every second like in
+        # a game
+        world.settle(600)
+        snapshot = world.snapshot()
+
+        results = []
+        for dirtyRects in (False, True):
+            world.restore(snapshot)
+            renderer = Renderer(world, WIDTH, HEIGHT, dirtyRects)
+            rng = random.Random(1)
+            for i in range(args.frames):
+                if i % 60 == 0:
+                    x = rng.uniform(20, WIDTH - 20)
+                    world.add_fruit(rng.randrange(DROP_TIERS), x, 50)
+                world.step()
+                renderer.render_frame()
+            results.append(
+                (renderer.FrameTimePercentile(50), renderer.FrameTimePercentile(95))
+            )
+            pg.display.quit()
+
+        print(
+            "{:5d} fruits : full redraw p50 {:6.2f}ms p95 {:6.2f}ms, "
+            "dirty rects p50 {:6.2f}ms p95 {:6.2f}ms".format(
+                fruits, *results[0], *results[1]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark World.step on the standard scenes
+
+python -m benchmarks.run --output results.json
+python -m benchmarks.run --compare results.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from benchmarks.scenes import StandardScenes
+from game_engine.stats import PHASES, StepStats
+from physic_engine import broadphase
+
+
+def CountAllocations(scene, steps):
+    """
+    Objects created (calls to an __init__ written in Python) and peak memory
+    allocated per step, on a separate run since the profiler slows it down
+    """
+    world = scene.Build()
+    counts = {}
+
+    def profile(frame, event, arg):
+        if event == "call" and frame.f_code.co_name == "__init__":
+            name = frame.f_code.co_qualname.split(".")[0]
+            counts[name] = counts.get(name, 0) + 1
+
+    peak = 0
+    tracemalloc.start()
+    for step in range(steps):
+        scene.Update(world, step)
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        sys.setprofile(profile)
+        world.step()
+        sys.setprofile(None)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    allocations = {name: count / steps for name, count in sorted(counts.items())}
+    return allocations, peak / steps
+
+
+def RunScene(scene, steps, allocationSteps):
+    world = scene.Build()
+    world.stats = StepStats(window=steps)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        scene.Update(world, step)
+        world.step()
+    elapsed = time.perf_counter() - start
+
+    allocations, peakBytes = CountAllocations(scene, allocationSteps)
+    return {
+        "steps": steps,
+        "bodies": len(world.bodies),
+        "steps_per_sec": steps / elapsed,
+        "contacts_per_step": sum(world.stats.counters["contacts"]) / steps,
+        "phases_ms_per_step": {
+            name: 1000.0 * sum(world.stats.timings[name]) / steps for name in PHASES
+        },
+        "allocations_per_step": sum(allocations.values()),
+        "allocations_by_type": allocations,
+        "peak_bytes_per_step": peakBytes,
+    }
+
+
+def GitRevision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def Compare(results, baseline):
+    print()
+    header = ("scene", "steps/s", "baseline", "ratio", "allocs", "baseline")
+    print("{:14s} {:>12s} {:>12s} {:>8s} {:>10s} {:>10s}".format(*header))
+    for name, result in results["scenes"].items():
+        old = baseline["scenes"].get(name)
+        if old is None:
+            continue
+        ratio = result["steps_per_sec"] / old["steps_per_sec"]
+        print(
+            "{:14s} {:12.1f} {:12.1f} {:7.2f}x {:10.0f} {:10.0f}".format(
+                name,
+                result["steps_per_sec"],
+                old["steps_per_sec"],
+                ratio,
+                result["allocations_per_step"],
+                old["allocations_per_step"],
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenes", nargs="+", help="names of the scenes to run")
+    parser.add_argument(
+        "--steps", type=float, default=1.0, help="scale the step counts"
+    )
+    parser.add_argument("--allocation-steps", type=int, default=5)
+    parser.add_argument("--broadphase", default="SweepAndPrune")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--box-walls",
+        action="store_true",
+        help="static boxes in the broadphase instead of half-plane walls",
+    )
+    parser.add_argument("--output", help="write the results as json")
+    parser.add_argument("--compare", help="json results to compare with")
+    args = parser.parse_args()
+
+    scenes = StandardScenes(
+        seed=args.seed,
+        broadphase=getattr(broadphase, args.broadphase),
+        walls=not args.box_walls,
+    )
+    if args.scenes:
+        scenes = [scene for scene in scenes if scene.name in args.scenes]
+
+    results = {
+        "revision": GitRevision(),
+        "python": platform.python_version(),
+        "broadphase": args.broadphase,
+        "seed": args.seed,
+        "walls": "boxes" if args.box_walls else "half-planes",
+        "scenes": {},
+    }
+    for scene in scenes:
+        steps = max(1, int(scene.steps * args.steps))
+        result = RunScene(scene, steps, args.allocation_steps)
+        results["scenes"][scene.name] = result
+        phases = " ".join(
+            "{} {:.2f}".format(name, ms)
+            for name, ms in result["phases_ms_per_step"].items()
+        )
+        print(
+            "{:14s} {:5d} bodies {:9.1f} steps/s {:9.0f} allocs/step "
+            "| ms/step: {}".format(
+                scene.name,
+                result["bodies"],
+                result["steps_per_sec"],
+                result["allocations_per_step"],
+                phases,
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            Compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Reproducible scenes for the benchmarks, all seeded and in a 800x600 box
+"""
+import random
+from common.math import Vec2
+from common.shape import Circle, Polygon
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+WIDTH = 800
+HEIGHT = 600
+WALL = 10
+
+
+def AddBox(world, x, y, hw, hh, static=False):
+    box = Polygon()
+    box.SetBox(hw, hh)
+    body = world.add(box, x, y)
+    if static:
+        body.SetStatic()
+        body.SetOrient(0.0)
+    return body
+
+
+def AddContainer(world, walls=True):
+    """
+    Floor and two walls, as half-planes or as static boxes in the
+    broadphase
+    """
+    if walls:
+        world.add_container(WIDTH, HEIGHT, 2 * WALL)
+        return
+    AddBox(world, WIDTH / 2, HEIGHT - WALL, WIDTH / 2, WALL, True)
+    AddBox(world, WALL, HEIGHT / 2, WALL, HEIGHT / 2, True)
+    AddBox(world, WIDTH - WALL, HEIGHT / 2, WALL, HEIGHT / 2, True)
+
+
+class Scene:
+    """
+    A world to build and an optional action before each step
+    """
+
+    name = ""
+    steps = 100
+
+    def __init__(self, seed=0, broadphase=SweepAndPrune, walls=True):
+        self.seed = seed
+        self.broadphase = broadphase
+        self.walls = walls
+        self.rng = None
+
+    def Build(self) -> World:
+        # A new generator per build, so that every run of a scene, timed or
+        # counting the allocations, gets the same bodies
+        self.rng = random.Random(self.seed)
+        world = World(1.0 / 60.0, 10, self.broadphase(), seed=self.seed)
+        AddContainer(world, self.walls)
+        return world
+
+    def Update(self, world, step):
+        pass
+
+
+class EmptyContainer(Scene):
+    name = "empty"
+    steps = 600
+
+
+class StackedCircles(Scene):
+    """
+    count circles in a grid resting at the bottom of the container
+    """
+
+    def __init__(self, count, radius=10, **kwargs):
+        super().__init__(**kwargs)
+        self.count = count
+        self.radius = radius
+        self.name = "circles_{}".format(count)
+        self.steps = max(20, 20000 // count)
+
+    def Build(self):
+        world = super().Build()
+        spacing = 2 * self.radius
+        columns = int((WIDTH - 4 * WALL) // spacing)
+        for i in range(self.count):
+            row, column = divmod(i, columns)
+            x = 2 * WALL + self.radius + column * spacing
+            y = HEIGHT - 2 * WALL - self.radius - row * spacing
+            world.add(Circle(self.radius), x, y)
+        return world
+
+
+class MixedPile(Scene):
+    """
+    Circles, boxes and triangles dropped on top of each other
+    """
+
+    name = "mixed_pile"
+    steps = 150
+
+    def Build(self):
+        world = super().Build()
+        rng = self.rng
+        for i in range(60):
+            x = rng.uniform(4 * WALL, WIDTH - 4 * WALL)
+            y = rng.uniform(50, HEIGHT - 100)
+            kind = i % 3
+            if kind == 0:
+                world.add(Circle(rng.uniform(8, 20)), x, y)
+            elif kind == 1:
+                AddBox(world, x, y, rng.uniform(8, 20), rng.uniform(8, 20))
+            else:
+                size = rng.uniform(10, 25)
+                triangle = Polygon()
+                triangle.Set(
+                    [Vec2(-size, size), Vec2(size, size), Vec2(0, -size)], 3
+                )
+                world.add(triangle, x, y)
+        return world
+
+
+class DropStorm(Scene):
+    """
+    A circle dropped from the top every other step
+    """
+
+    name = "drop_storm"
+    steps = 400
+
+    def Update(self, world, step):
+        if step % 2 == 0:
+            x = self.rng.uniform(4 * WALL, WIDTH - 4 * WALL)
+            world.add(Circle(self.rng.uniform(8, 20)), x, 30)
+
+
+def StandardScenes(**kwargs):
+    return [
+        EmptyContainer(**kwargs),
+        StackedCircles(50, **kwargs),
+        StackedCircles(200, **kwargs),
+        StackedCircles(1000, **kwargs),
+        MixedPile(**kwargs),
+        DropStorm(**kwargs),
+    ]
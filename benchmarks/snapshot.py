@@ -0,0 +1,62 @@
+"""
+Snapshots and restores per second of a World
+
+python -m benchmarks.snapshot
+"""
+import argparse
+import copy
+import random
+import time
+from common.shape import Circle
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+
+def Build(bodies, seed=0):
+    random.seed(seed)
+    world = World(1.0 / 60.0, 10, SweepAndPrune())
+    for i in range(bodies):
+        x = random.uniform(0, 800)
+        y = random.uniform(0, 600)
+        world.add(Circle(random.uniform(10, 30)), x, y)
+    return world
+
+
+def Measure(function, duration):
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        function()
+        count += 1
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bodies", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=1.0)
+    args = parser.parse_args()
+
+    for bodies in args.bodies:
+        world = Build(bodies)
+        snapshot = world.snapshot()
+
+        snapshots = Measure(world.snapshot, args.duration)
+        restores = Measure(lambda: world.restore(snapshot), args.duration)
+        deepcopies = Measure(lambda: copy.deepcopy(world), args.duration)
+        print(
+            "{:5d} bodies : {:9.1f} snapshots/s {:9.1f} restores/s "
+            "{:9.1f} deepcopies/s, {} bytes".format(
+                bodies,
+                snapshots,
+                restores,
+                deepcopies,
+                snapshot.data.itemsize * len(snapshot.data),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
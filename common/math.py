@@ -9,8 +9,12 @@ RAND_MAX = 32767
 class Vec2:
     """
     Vecteur 2D
+
+    The operators return new vectors, the methods modify the vector in place
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -52,6 +56,39 @@ class Vec2:
         self.x = x_
         self.y = y_
 
+    def Add(self, v) -> None:
+        self.x += v.x
+        self.y += v.y
+
+    def Sub(self, v) -> None:
+        self.x -= v.x
+        self.y -= v.y
+
+    def AddScaled(self, v, s) -> None:
+        """
+        self += v * s
+        """
+        self.x += v.x * s
+        self.y += v.y * s
+
+    def SubScaled(self, v, s) -> None:
+        """
+        self -= v * s
+        """
+        self.x -= v.x * s
+        self.y -= v.y * s
+
+    def SetSub(self, a, b) -> None:
+        """
+        self = a - b
+        """
+        self.x = a.x - b.x
+        self.y = a.y - b.y
+
+    def Scale(self, s) -> None:
+        self.x *= s
+        self.y *= s
+
     def LenSqr(self) -> float:
         return self.x**2 + self.y**2
 
@@ -170,9 +207,9 @@ def Cross(a, b):
     """
     if isinstance(a, Vec2) and isinstance(b, Vec2):
         return a.x * b.y - a.y * b.x
-    if isinstance(a, Vec2) and isinstance(b, float or int):
+    if isinstance(a, Vec2) and isinstance(b, (float, int)):
         return Vec2(b * a.y, -b * a.x)
-    if isinstance(a, float or int) and isinstance(b, Vec2):
+    if isinstance(a, (float, int)) and isinstance(b, Vec2):
         return Vec2(-a * b.y, a * b.x)
 
 
@@ -196,8 +233,12 @@ def Round(a):
     return int(a + 0.5)
 
 
-def Random(l, h):
-    a = random.random()
+def Random(l, h, rng=random):
+    """
+    Random number between l and h, drawn from rng (the global random module
+    by default)
+    """
+    a = rng.random()
     a /= RAND_MAX
     a = (h - l) * a + l
     return a
@@ -1,9 +1,17 @@
+import weakref
+from array import array
 from common.math import *
-import math
-import pygame as pg
+
+# Shape type ids, index the collision dispatch tables
+CIRCLE = 0
+POLYGON = 1
+HALFPLANE = 2
+SHAPE_TYPE_COUNT = 3
 
 
 class Shape:
+    typeId = None
+
     def __init__(self):
         self.body = None
 
@@ -16,11 +24,13 @@ class Shape:
     def SetOrientation(self, radians):
         pass
 
-    def Draw(self):
+    def GetAABB(self):
         pass
 
 
 class Circle(Shape):
+    typeId = CIRCLE
+
     def __init__(self, radius):
         super().__init__()
         self.radius = radius
@@ -37,28 +47,126 @@ class Circle(Shape):
     def SetOrientation(self, radians):
         pass
 
-    def Draw(self, screen):
-        # Draw the outline of the circle
-        position = (self.body.position.x, self.body.position.y)
-        pg.draw.circle(
-            screen, (255, 255, 255), position, self.radius, 1
-        )  # 1 pixel outline
+    def GetAABB(self):
+        """
+        World space bounding box : (minX, minY, maxX, maxY)
+        """
+        x = self.body.position.x
+        y = self.body.position.y
+        r = self.radius
+        return (x - r, y - r, x + r, y + r)
+
+
+class HalfPlane(Shape):
+    """
+    Static boundary through the body position, the normal points to the
+    free side. Used by World.add_wall.
+    """
+
+    typeId = HALFPLANE
+
+    def __init__(self, normal):
+        super().__init__()
+        self.normal = Vec2(normal.x, normal.y)
+        self.normal.normalize()
+
+    def GetType(self):
+        return "HalfPlane"
+
+    def ComputeMass(self, density):
+        self.body.mass = 0.0
+        self.body.invMass = 0.0
+        self.body.inertia = 0.0
+        self.body.invInertia = 0.0
+
+    def SetOrientation(self, radians):
+        pass
+
+    def GetAABB(self):
+        """
+        Unbounded, a half-plane overlaps every body
+        """
+        return (-float("inf"), -float("inf"), float("inf"), float("inf"))
+
+    def Offset(self) -> float:
+        """
+        Dot(normal, p) - Offset() is the distance of p to the boundary
+        """
+        return Dot(self.normal, self.body.position)
 
-        # Draw the orientation line
-        end_x = self.body.position.x + self.radius * math.cos(self.body.orientation)
-        end_y = self.body.position.y + self.radius * math.sin(self.body.orientation)
-        pg.draw.line(screen, (255, 0, 0), position, (end_x, end_y), 1)
+
+class PolygonGeometry:
+    """
+    Vertices and normals of a polygon in model space, stored flat :
+    x0, y0, x1, y1, ...
+
+    Never modified once built, so identical polygons share the same
+    instance, see Intern
+    """
+
+    __slots__ = ("count", "vertices", "normals", "__weakref__")
+
+    _instances = weakref.WeakValueDictionary()
+
+    def __init__(self, vertices, normals):
+        self.count = len(vertices) // 2
+        self.vertices = array("d", vertices)
+        self.normals = array("d", normals)
+
+    @classmethod
+    def Intern(cls, vertices, normals):
+        """
+        The shared geometry with these coordinates
+        """
+        key = (tuple(vertices), tuple(normals))
+        geometry = cls._instances.get(key)
+        if geometry is None:
+            geometry = cls(key[0], key[1])
+            cls._instances[key] = geometry
+        return geometry
+
+    def GetVertex(self, i) -> Vec2:
+        return Vec2(self.vertices[2 * i], self.vertices[2 * i + 1])
+
+    def GetNormal(self, i) -> Vec2:
+        return Vec2(self.normals[2 * i], self.normals[2 * i + 1])
 
 
 class Polygon(Shape):
+    typeId = POLYGON
     maxPolyVertexCount = 64
 
     def __init__(self):
         super().__init__()
         self.u = Mat2()  # orientation matrix
-        self.m_vertexCount = 0
-        self.m_vertices = [Vec2(0, 0) for _ in range(self.maxPolyVertexCount)]
-        self.m_normals = [Vec2(0, 0) for _ in range(self.maxPolyVertexCount)]
+        self.geometry = PolygonGeometry.Intern((), ())
+
+        # World space geometry, see UpdateWorldGeometry
+        self.worldVertices = array("d")
+        self.worldNormals = array("d")
+        self.aabb = None
+        self.worldValid = False
+        self.worldX = 0.0
+        self.worldY = 0.0
+
+    @property
+    def m_vertexCount(self):
+        return self.geometry.count
+
+    @property
+    def m_vertices(self):
+        """
+        Copies of the model space vertices, the geometry is shared
+        """
+        return tuple(self.geometry.GetVertex(i) for i in range(self.geometry.count))
+
+    @property
+    def m_normals(self):
+        return tuple(self.geometry.GetNormal(i) for i in range(self.geometry.count))
+
+    def SetGeometry(self, geometry: PolygonGeometry):
+        self.geometry = geometry
+        self.worldValid = False
 
     def ComputeMass(self, density):
         c = Vec2(0.0, 0.0)  # centroid
@@ -66,10 +174,12 @@ class Polygon(Shape):
         I = 0.0
         k_inv3 = 1.0 / 3.0
 
-        for i1 in range(self.m_vertexCount):
-            p1 = self.m_vertices[i1]
-            i2 = i1 + 1 if i1 + 1 < self.m_vertexCount else 0
-            p2 = self.m_vertices[i2]
+        vertices = self.m_vertices
+        count = len(vertices)
+        for i1 in range(count):
+            p1 = vertices[i1]
+            i2 = i1 + 1 if i1 + 1 < count else 0
+            p2 = vertices[i2]
 
             D = Cross(p1, p2)
             triangleArea = 0.5 * D
@@ -82,10 +192,15 @@ class Polygon(Shape):
             inty2 = p1.y * p1.y + p2.y * p1.y + p2.y * p2.y
             I += (0.25 * k_inv3 * D) * (intx2 + inty2)
 
-        x *= 1 / area
+        c *= 1 / area
 
-        for i in range(self.m_vertexCount):
-            self.m_vertices[i] -= c
+        # Translate vertices to centroid (make the centroid (0, 0)
+        # for the polygon in model space)
+        if c.x != 0.0 or c.y != 0.0:
+            centered = []
+            for v in vertices:
+                centered += (v.x - c.x, v.y - c.y)
+            self.SetGeometry(PolygonGeometry.Intern(centered, self.geometry.normals))
 
         self.body.mass = density * area
         self.body.invMass = 1.0 / self.body.mass if self.body.mass else 0.0
@@ -94,24 +209,78 @@ class Polygon(Shape):
 
     def SetOrientation(self, radians):
         self.u.Set(radians)
+        self.worldValid = False
 
     def GetType(self):
         return "Polygon"
 
+    def UpdateWorldGeometry(self):
+        """
+        Transform the vertices and normals to world space and compute the
+        AABB, only if the body moved or turned since the last call
+        """
+        position = self.body.position
+        px = position.x
+        py = position.y
+        if self.worldValid and px == self.worldX and py == self.worldY:
+            return
+
+        geometry = self.geometry
+        size = 2 * geometry.count
+        if len(self.worldVertices) != size:
+            self.worldVertices = array("d", bytes(8 * size))
+            self.worldNormals = array("d", bytes(8 * size))
+
+        m00 = self.u.m00
+        m01 = self.u.m01
+        m10 = self.u.m10
+        m11 = self.u.m11
+        vertices = geometry.vertices
+        normals = geometry.normals
+        worldVertices = self.worldVertices
+        worldNormals = self.worldNormals
+        minX = minY = float("inf")
+        maxX = maxY = -float("inf")
+        for i in range(0, size, 2):
+            vx = vertices[i]
+            vy = vertices[i + 1]
+            x = m00 * vx + m01 * vy + px
+            y = m10 * vx + m11 * vy + py
+            worldVertices[i] = x
+            worldVertices[i + 1] = y
+            minX = min(minX, x)
+            minY = min(minY, y)
+            maxX = max(maxX, x)
+            maxY = max(maxY, y)
+
+            nx = normals[i]
+            ny = normals[i + 1]
+            worldNormals[i] = m00 * nx + m01 * ny
+            worldNormals[i + 1] = m10 * nx + m11 * ny
+
+        self.aabb = (minX, minY, maxX, maxY)
+        self.worldValid = True
+        self.worldX = px
+        self.worldY = py
+
+    def GetAABB(self):
+        """
+        World space bounding box : (minX, minY, maxX, maxY)
+        """
+        self.UpdateWorldGeometry()
+        return self.aabb
+
     def SetBox(self, hw, hh):
         """
         hh : half height
         hw : half width
         """
-        self.m_vertexCount = 4
-        self.m_vertices[0].Set(-hw, -hh)
-        self.m_vertices[1].Set(hw, -hh)
-        self.m_vertices[2].Set(hw, hh)
-        self.m_vertices[3].Set(-hw, hh)
-        self.m_normals[0].Set(0.0, -1.0)
-        self.m_normals[1].Set(1.0, 0.0)
-        self.m_normals[2].Set(0.0, 1.0)
-        self.m_normals[3].Set(-1.0, 0.0)
+        self.SetGeometry(
+            PolygonGeometry.Intern(
+                (-hw, -hh, hw, -hh, hw, hh, -hw, hh),
+                (0.0, -1.0, 1.0, 0.0, 0.0, 1.0, -1.0, 0.0),
+            )
+        )
 
     def Set(self, vertices, count):
         # No hulls with less than 3 vertices (ensure actual polygon)
@@ -131,55 +300,65 @@ class Polygon(Shape):
                 if vertices[i].y < vertices[rightMost].y:
                     rightMost = i
 
-        hull = [0 for _ in range(self.maxPolyVertexCount)]
-        outCount = 0
+        hull = []
         indexHull = rightMost
 
+        # Gift wrapping
         while True:
-            hull[outCount] = indexHull
+            hull.append(indexHull)
             nextHullIndex = 0
             for i in range(1, count):
                 if nextHullIndex == indexHull:
                     nextHullIndex = i
                     continue
 
-            e1 = vertices[nextHullIndex] - vertices[hull[outCount]]
-            e2 = vertices[i] - vertices[hull[outCount]]
-            c = Cross(e1, e2)
-            if c < 0.0:
-                nextHullIndex = i
+                e1 = vertices[nextHullIndex] - vertices[indexHull]
+                e2 = vertices[i] - vertices[indexHull]
+                c = Cross(e1, e2)
+                if c < 0.0:
+                    nextHullIndex = i
 
-            if c == 0.0 and e2.LenSqr() > e1.LenSqr():
-                nextHullIndex = i
+                # Cross product is zero then e vectors are on same line
+                # therefore want to record vertex farthest along that line
+                if c == 0.0 and e2.LenSqr() > e1.LenSqr():
+                    nextHullIndex = i
 
-            outCount += 1
             indexHull = nextHullIndex
 
             if nextHullIndex == rightMost:
-                self.m_vertexCount = outCount
                 break
 
-            for i in range(0, self.m_vertexCount):
-                self.m_vertices[i] = vertices[hull[i]]
+        # Copy vertices into shape's vertices
+        flatVertices = []
+        for i in hull:
+            flatVertices += (vertices[i].x, vertices[i].y)
+
+        # Compute face normals
+        flatNormals = []
+        hullCount = len(hull)
+        for i1 in range(hullCount):
+            i2 = i1 + 1 if i1 + 1 < hullCount else 0
+            face = vertices[hull[i2]] - vertices[hull[i1]]
 
-            for i1 in range(0, self.m_vertexCount):
-                i2 = i1 + 1 if i1 + 1 < self.m_vertexCount else 0
-                face = self.m_vertices[i2] - self.m_vertices[i1]
+            # Ensure no zero-length edges
+            assert face.LenSqr() > EPSILON * EPSILON
 
-                assert face.LenSqr() > EPSILON * EPSILON
+            # Calculate normal with 2D cross product between vector and scalar
+            normal = Vec2(face.y, -face.x)
+            normal.normalize()
+            flatNormals += (normal.x, normal.y)
 
-                self.m_normals[i1] = Vec2(face.y, -face.x)
-                self.m_normals[i1].normalize
+        self.SetGeometry(PolygonGeometry.Intern(flatVertices, flatNormals))
 
     def GetSupport(self, dir):
         bestProjection = -float("inf")
-        bestVertex = None
-        for i in range(self.m_vertexCount):
-            v = self.m_vertices[i]
-            projection = Dot(v, dir)
+        bestIndex = 0
+        vertices = self.geometry.vertices
+        for i in range(0, len(vertices), 2):
+            projection = vertices[i] * dir.x + vertices[i + 1] * dir.y
 
             if projection > bestProjection:
-                bestVertex = v
+                bestIndex = i
                 bestProjection = projection
 
-        return bestVertex
+        return Vec2(vertices[bestIndex], vertices[bestIndex + 1])
@@ -0,0 +1,29 @@
+import argparse
+import time
+from visualization.trajectoryExport import ExportFrames, ExportVideo
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render a trajectory file to png frames or a video, without display"
+    )
+    parser.add_argument("trajectory")
+    parser.add_argument("output", help="directory of the frames, or video with --video")
+    parser.add_argument("--video", action="store_true", help="encode with ffmpeg")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--every", type=int, default=1, help="render one step in N")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    size = (args.width, args.height)
+    export = ExportVideo if args.video else ExportFrames
+    start = time.perf_counter()
+    frames = export(args.trajectory, args.output, size, args.every, args.workers)
+    elapsed = time.perf_counter() - start
+    print("{} frames, {:.1f} frames/s".format(frames, frames / elapsed))
+
+
+# The workers of the pool import this module
+if __name__ == "__main__":
+    main()
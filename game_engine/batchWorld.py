@@ -0,0 +1,180 @@
+import numpy as np
+from common.math import *
+from physic_engine.vectorized import *
+
+
+class BatchWorld:
+    """
+    N independent circle worlds stepped together.
+
+    The bodies of all the worlds live in the same BodyArrays of
+    count * maxBodies slots, exposed with a leading batch dimension through
+    the properties below. Empty slots are static bodies of radius 0.
+
+    An action is the x coordinate where a new circle is dropped, NaN for no
+    drop. The score of a world is the number of circles it holds on the
+    screen, the reward is its change : 1 per circle dropped, -1 per circle
+    that fell out. An episode is done when a world is full or a body fell
+    out of the screen, the done worlds are frozen until they are reset.
+    """
+
+    observationSize = 5  # x, y, vx, vy, radius
+
+    def __init__(
+        self,
+        count,
+        dt,
+        iterations,
+        maxBodies=128,
+        width=800,
+        height=600,
+        dropY=50,
+        radius=20,
+        seed=None,
+    ):
+        self.count = count
+        self.dt = dt
+        self.iterations = iterations
+        self.maxBodies = maxBodies
+        self.width = width
+        self.height = height
+        self.dropY = dropY
+        self.radius = radius
+
+        self.gravityScale = 5
+        self.gravity = np.array((0, 9.81 * self.gravityScale))
+
+        self.rng = np.random.default_rng(seed)
+
+        self.arrays = BodyArrays(count * maxBodies)
+        self.alive = np.zeros((count, maxBodies), dtype=bool)
+        self.group = np.repeat(np.arange(count), maxBodies)
+        self.score = np.zeros(count)
+
+        self.observation = np.zeros((count, maxBodies, self.observationSize))
+        self.reward = np.zeros(count)
+        self.done = np.zeros(count, dtype=bool)
+
+    def _batched(self, name):
+        array = getattr(self.arrays, name)
+        return array.reshape((self.count, self.maxBodies) + array.shape[1:])
+
+    position = property(lambda self: self._batched("position"))
+    velocity = property(lambda self: self._batched("velocity"))
+    orientation = property(lambda self: self._batched("orientation"))
+    angularVelocity = property(lambda self: self._batched("angularVelocity"))
+    radii = property(lambda self: self._batched("radius"))
+
+    def reset(self, worlds=None):
+        """
+        Empty the given worlds (all of them by default)
+        """
+        if worlds is None:
+            worlds = np.arange(self.count)
+        worlds = np.asarray(worlds)
+
+        slots = (worlds[:, None] * self.maxBodies + np.arange(self.maxBodies)).ravel()
+        for name in BodyArrays.fields:
+            getattr(self.arrays, name)[slots] = 0
+        self.alive[worlds] = False
+        self.score[worlds] = 0
+        self.done[worlds] = False
+
+        return self.observe()
+
+    def add(self, worlds, x, y, radius):
+        """
+        Add one circle to each of the given worlds, worlds that are full are
+        skipped
+        """
+        worlds = np.asarray(worlds)
+        free = ~self.alive[worlds]
+        hasRoom = free.any(axis=1)
+        worlds = worlds[hasRoom]
+        slots = np.argmax(free[hasRoom], axis=1)
+        i = worlds * self.maxBodies + slots
+
+        a = self.arrays
+        a.position[i, 0] = np.broadcast_to(x, hasRoom.shape)[hasRoom]
+        a.position[i, 1] = np.broadcast_to(y, hasRoom.shape)[hasRoom]
+        a.velocity[i] = 0
+        a.force[i] = 0
+        a.orientation[i] = np.radians(self.rng.integers(0, 361, len(i)))
+        a.angularVelocity[i] = 0
+        a.torque[i] = 0
+
+        r = np.broadcast_to(radius, hasRoom.shape)[hasRoom]
+        a.radius[i] = r
+        a.mass[i] = PI * r * r
+        a.invMass[i] = 1.0 / a.mass[i]
+        a.inertia[i] = a.mass[i] * r * r
+        a.invInertia[i] = 1.0 / a.inertia[i]
+
+        a.staticFriction[i] = 0.5
+        a.dynamicFriction[i] = 0.3
+        a.restitution[i] = 0.2
+
+        self.alive[worlds, slots] = True
+
+    def step(self, actions):
+        """
+        Drop the circles of the actions and advance all the worlds by one step
+
+        Return the observations, rewards and done flags. The arrays are
+        reused between calls.
+        """
+        actions = np.asarray(actions, dtype=float)
+        drop = np.flatnonzero(~np.isnan(actions) & ~self.done)
+        if drop.size:
+            self.add(drop, actions[drop], self.dropY, self.radius)
+
+        running = ~self.done
+        self.simulate()
+
+        fell = (self.position[:, :, 1] - self.radii > self.height) & self.alive
+        held = np.count_nonzero(self.alive & ~fell, axis=1)
+        np.subtract(held, self.score, out=self.reward)
+        self.reward[self.done] = 0
+        self.score[running] = held[running]
+        self.done |= fell.any(axis=1) | self.alive.all(axis=1)
+
+        return self.observe(), self.reward, self.done
+
+    def simulate(self):
+        s = self.arrays
+        running = ~self.done[self.group]
+
+        # Generate new collision info, one sweep over the bodies of the worlds
+        # that are not done
+        live = np.flatnonzero(self.alive.ravel() & running)
+        A, B = CircleContacts(
+            s.position[live], s.radius[live], s.invMass[live], self.group[live]
+        )
+        contacts = ContactBatch(s, live[A], live[B])
+
+        # Integrate forces
+        IntegrateForces(s, self.gravity, self.dt, running)
+
+        # Initialize collisions
+        contacts.Initialize(s, self.dt, self.gravity)
+
+        # Solve collisions
+        for j in range(0, self.iterations):
+            contacts.ApplyImpulse(s)
+
+        # Integrate velocities
+        IntegrateVelocity(s, self.gravity, self.dt, running)
+
+        # Correct positions
+        contacts.PositionalCorrection(s)
+
+        # Clear all forces
+        s.force[:] = 0
+        s.torque[:] = 0
+
+    def observe(self):
+        obs = self.observation
+        obs[:, :, 0:2] = self.position
+        obs[:, :, 2:4] = self.velocity
+        obs[:, :, 4] = self.radii
+        return obs
@@ -0,0 +1,199 @@
+import math
+import random
+import numpy as np
+from common.math import *
+from common.shape import Circle
+from physic_engine.vectorized import *
+
+
+def _ScalarProperty(name):
+    def get(self):
+        return float(getattr(self.world.arrays, name)[self.index])
+
+    def set(self, value):
+        getattr(self.world.arrays, name)[self.index] = value
+
+    return property(get, set)
+
+
+class _VectorView(Vec2):
+    """
+    Vec2 whose coordinates are a row of an array of a CircleWorld, the
+    methods that modify it in place write to the array. The operators still
+    return new plain vectors.
+    """
+
+    __slots__ = ("body", "name")
+
+    def __init__(self, body, name):
+        self.body = body
+        self.name = name
+
+    def _Row(self):
+        # Looked up at each access, the arrays are reallocated when they grow
+        return getattr(self.body.world.arrays, self.name)[self.body.index]
+
+    def _GetX(self):
+        return float(self._Row()[0])
+
+    def _SetX(self, value):
+        self._Row()[0] = value
+
+    def _GetY(self):
+        return float(self._Row()[1])
+
+    def _SetY(self, value):
+        self._Row()[1] = value
+
+    x = property(_GetX, _SetX)
+    y = property(_GetY, _SetY)
+
+
+def _VectorProperty(name):
+    def get(self) -> Vec2:
+        return _VectorView(self, name)
+
+    def set(self, value: Vec2):
+        getattr(self.world.arrays, name)[self.index] = (value.x, value.y)
+
+    return property(get, set)
+
+
+class CircleBody:
+    """
+    View on a body stored in a CircleWorld, with the same attributes as Body.
+
+    position, velocity and force are views too : modifying them in place,
+    like body.velocity.Set(x, y), writes to the arrays of the world. Copy
+    them with Vec2(v.x, v.y) to keep a value.
+    """
+
+    position = _VectorProperty("position")
+    velocity = _VectorProperty("velocity")
+    force = _VectorProperty("force")
+
+    orientation = _ScalarProperty("orientation")
+    angularVelocity = _ScalarProperty("angularVelocity")
+    torque = _ScalarProperty("torque")
+
+    inertia = _ScalarProperty("inertia")
+    invInertia = _ScalarProperty("invInertia")
+    mass = _ScalarProperty("mass")
+    invMass = _ScalarProperty("invMass")
+
+    staticFriction = _ScalarProperty("staticFriction")
+    dynamicFriction = _ScalarProperty("dynamicFriction")
+    restitution = _ScalarProperty("restitution")
+
+    def __init__(self, world, index, shape):
+        self.world = world
+        self.index = index
+        self.shape = shape
+        self.shape.body = self
+
+    def ApplyForce(self, force: Vec2) -> None:
+        self.world.arrays.force[self.index] += (force.x, force.y)
+
+    def ApplyImpulse(self, impulse: Vec2, contactVector: Vec2) -> None:
+        a = self.world.arrays
+        i = self.index
+        a.velocity[i] += (impulse.x * a.invMass[i], impulse.y * a.invMass[i])
+        a.angularVelocity[i] += a.invInertia[i] * Cross(contactVector, impulse)
+
+    def SetStatic(self) -> None:
+        self.inertia = 0.0
+        self.invInertia = 0.0
+        self.mass = 0.0
+        self.invMass = 0.0
+
+    def SetOrient(self, radians: float) -> None:
+        self.orientation = radians
+
+
+class CircleWorld:
+    """
+    World restricted to circles, with the bodies stored in numpy arrays and
+    the collisions solved in batches.
+
+    Same interface as World : add, step, get_bodies
+    """
+
+    def __init__(self, dt, iterations, capacity=64, seed=None):
+        self.debugMode = False
+        self.dt = dt
+        self.iterations = iterations
+
+        self.arrays = BodyArrays(capacity)
+        self.count = 0
+        self.bodies = []
+        self.contacts = None
+
+        self.gravityScale = 5
+        self.gravity = np.array((0, 9.81 * self.gravityScale))
+
+        self.score = 0
+
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def get_bodies(self):
+        return self.bodies
+
+    def add(self, shape, x, y):
+        if not isinstance(shape, Circle):
+            raise TypeError("CircleWorld only supports Circle shapes")
+
+        if self.count == len(self.arrays.radius):
+            self.arrays.Grow(max(2 * self.count, 1))
+
+        i = self.count
+        a = self.arrays
+        a.position[i] = (x, y)
+        a.velocity[i] = 0
+        a.force[i] = 0
+        a.orientation[i] = math.radians(self.rng.randint(0, 360))
+        a.angularVelocity[i] = 0
+        a.torque[i] = 0
+
+        a.radius[i] = shape.radius
+        a.mass[i] = PI * shape.radius * shape.radius
+        a.invMass[i] = 1.0 / a.mass[i] if a.mass[i] else 0.0
+        a.inertia[i] = a.mass[i] * shape.radius * shape.radius
+        a.invInertia[i] = 1.0 / a.inertia[i] if a.inertia[i] else 0.0
+
+        a.staticFriction[i] = 0.5
+        a.dynamicFriction[i] = 0.3
+        a.restitution[i] = 0.2
+
+        self.count += 1
+        body = CircleBody(self, i, shape)
+        self.bodies.append(body)
+        return body
+
+    def step(self):
+        s = self.arrays.Slice(self.count)
+
+        # Generate new collision info
+        A, B = CircleContacts(s.position, s.radius, s.invMass)
+        contacts = ContactBatch(s, A, B)
+        self.contacts = contacts
+
+        # Integrate forces
+        IntegrateForces(s, self.gravity, self.dt)
+
+        # Initialize collisions
+        contacts.Initialize(s, self.dt, self.gravity)
+
+        # Solve collisions
+        for j in range(0, self.iterations):
+            contacts.ApplyImpulse(s)
+
+        # Integrate velocities
+        IntegrateVelocity(s, self.gravity, self.dt)
+
+        # Correct positions
+        contacts.PositionalCorrection(s)
+
+        # Clear all forces
+        s.force[:] = 0
+        s.torque[:] = 0
@@ -1,7 +1,14 @@
-import pygame as pg
+import time
 
 
 class Clock:
+    @staticmethod
+    def Ticks():
+        """
+        Milliseconds from an arbitrary origin
+        """
+        return time.perf_counter() * 1000.0
+
     def __init__(self):
         self.m_start = 0
         self.m_stop = 0
@@ -9,18 +16,18 @@ class Clock:
         self.Start()
 
     def Start(self):
-        self.m_start = pg.time.get_ticks()
+        self.m_start = self.Ticks()
 
     def Stop(self):
-        self.m_stop = pg.time.get_ticks()
+        self.m_stop = self.Ticks()
 
     def Elapsed(self):
-        self.m_current = pg.time.get_ticks()
+        self.m_current = self.Ticks()
         return (self.m_current - self.m_start) / 1000.0
 
     def Difference(self):
         return (self.m_stop - self.m_start) / 1000.0
 
     def Current(self):
-        self.m_current = pg.time.get_ticks()
+        self.m_current = self.Ticks()
         return self.m_current
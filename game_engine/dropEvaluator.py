@@ -0,0 +1,303 @@
+import numpy as np
+from common.math import *
+from common.shape import CIRCLE
+from game_engine.fruit import FRUITS
+from physic_engine.vectorized import *
+
+
+class DropEvaluator:
+    """
+    Outcome of dropping a fruit at K candidate x positions from the state of
+    a World, the K branches being settled together like a BatchWorld.
+
+    The world may only hold circles and walls. Its bodies are copied once
+    per branch, while the walls are static slots shared by all the branches.
+    The pairs inside the pile are found once for all the branches, with a
+    margin. They are reused as long as the pile of a branch has neither
+    merged nor moved by more than margin / 2, only the dropped fruit being
+    tested against it. The other branches go through CircleContacts.
+
+    A branch stops when it comes to rest like World.settle, or after
+    maxSteps steps, and is no longer stepped. Its game is over if a body
+    then sticks out above limitY.
+    """
+
+    def __init__(
+        self,
+        world,
+        dropY=50,
+        limitY=100,
+        maxSteps=300,
+        tolerance=25.0,
+        maxPenetration=1.0,
+        restSteps=10,
+        margin=2.0,
+    ):
+        self.world = world
+        self.dropY = dropY
+        self.limitY = limitY
+        self.maxSteps = maxSteps
+        self.tolerance = tolerance
+        self.maxPenetration = maxPenetration
+        self.restSteps = restSteps
+        self.margin = margin
+
+    def Evaluate(self, xs, tier):
+        """
+        Drop a fruit of FRUITS[tier] at each x of xs.
+
+        Return per candidate the score, the height of the pile above the
+        floor and the game over flag when the branch stopped, and the number
+        of steps it took.
+        """
+        xs = np.asarray(xs, dtype=float)
+        world = self.world
+        for body in world.get_bodies():
+            if body.shape.typeId != CIRCLE:
+                raise ValueError("DropEvaluator only supports circles and walls")
+
+        branches = len(xs)
+        base, tiers = self._Base(tier)
+        size = len(tiers)
+
+        # Slots : the walls then the bodies of each branch, the dropped fruit
+        # last
+        walls = len(world.walls)
+        s = BodyArrays(walls + branches * size)
+        for name in BodyArrays.fields:
+            array = getattr(s, name)
+            reps = (branches,) + (1,) * (array.ndim - 1)
+            array[walls:] = np.tile(getattr(base, name), reps)
+        s.position[walls + size - 1 :: size, 0] = xs
+        tiers = np.tile(tiers, branches)
+        baseTiers = tiers.reshape(branches, size).copy()
+
+        normals = np.zeros((walls, 2))
+        offsets = np.zeros(walls)
+        for w, wall in enumerate(world.walls):
+            normals[w] = (wall.shape.normal.x, wall.shape.normal.y)
+            offsets[w] = wall.shape.Offset()
+            s.position[w] = (wall.position.x, wall.position.y)
+            s.staticFriction[w] = wall.staticFriction
+            s.dynamicFriction[w] = wall.dynamicFriction
+            s.restitution[w] = wall.restitution
+
+        bodies = s.Slice(branches * size, walls)
+        group = np.repeat(np.arange(branches), size)
+        alive = np.ones(branches * size, dtype=bool)
+        moving = np.zeros(len(s.radius), dtype=bool)
+        gravity = np.array((world.gravity.x, world.gravity.y))
+
+        pileA, pileB = CircleContacts(
+            base.position[:-1], base.radius[:-1] + self.margin / 2, base.invMass[:-1]
+        )
+        quiet = np.ones(branches, dtype=bool)
+
+        score = np.full(branches, float(world.score))
+        height = np.zeros(branches)
+        gameOver = np.zeros(branches, dtype=bool)
+        steps = np.zeros(branches, dtype=int)
+        running = np.ones(branches, dtype=bool)
+        rest = np.zeros(branches, dtype=int)
+        for step in range(self.maxSteps):
+            # The bodies of the stopped branches are left as they are
+            active = alive & running[group]
+            quiet &= running
+            moving[walls:] = active
+            A, B = self._Pairs(bodies, size, group, active, quiet, pileA, pileB)
+            contacts = self._Contacts(s, walls, A, B, active, normals, offsets)
+
+            # Same phases as World.step
+            IntegrateForces(s, gravity, world.dt, moving)
+            contacts.Initialize(s, world.dt, gravity)
+            for j in range(world.iterations):
+                contacts.ApplyImpulse(s)
+            IntegrateVelocity(s, gravity, world.dt, moving)
+            contacts.PositionalCorrection(s)
+            s.force[:] = 0
+            s.torque[:] = 0
+            self._Merge(s, walls, size, contacts, tiers, alive, score, running)
+
+            # Quiet until the pile moves by margin / 2 or a merge changes a tier
+            pile = bodies.position.reshape(branches, size, 2)[:, :-1]
+            shift = ((pile - base.position[:-1]) ** 2).sum(axis=2)
+            quiet &= shift.max(axis=1, initial=0.0) <= (self.margin / 2) ** 2
+            quiet &= (tiers.reshape(branches, size) == baseTiers).all(axis=1)
+
+            # Rest test, like World.settle
+            v = bodies.velocity
+            w = bodies.angularVelocity
+            energy = (DotVV(v, v) + bodies.inertia * bodies.invMass * w * w) * 0.5
+            energy = energy.reshape(branches, size).max(axis=1)
+            penetration = np.zeros(branches)
+            np.maximum.at(
+                penetration, (contacts.B - walls) // size, contacts.penetration
+            )
+            resting = (energy <= self.tolerance) & (penetration <= self.maxPenetration)
+            rest = np.where(resting, rest + 1, 0)
+            steps[running] += 1
+
+            stopped = running & (rest >= self.restSteps)
+            if step + 1 == self.maxSteps:
+                stopped = running
+            if stopped.any():
+                top = np.where(alive, bodies.position[:, 1] - bodies.radius, np.inf)
+                top = top.reshape(branches, size).min(axis=1)
+                height[stopped] = self._Floor() - top[stopped]
+                gameOver[stopped] = top[stopped] < self.limitY
+                running &= ~stopped
+            if not running.any():
+                break
+
+        return score, height, gameOver, steps
+
+    def _Base(self, tier):
+        """
+        Arrays of the bodies of the world followed by the dropped fruit, and
+        their tiers (-1 for the bodies that are not fruits)
+        """
+        bodies = self.world.get_bodies()
+        base = BodyArrays(len(bodies) + 1)
+        for i, body in enumerate(bodies):
+            base.position[i] = (body.position.x, body.position.y)
+            base.velocity[i] = (body.velocity.x, body.velocity.y)
+            base.force[i] = (body.force.x, body.force.y)
+            base.orientation[i] = body.orientation
+            base.angularVelocity[i] = body.angularVelocity
+            base.torque[i] = body.torque
+            base.mass[i] = body.mass
+            base.invMass[i] = body.invMass
+            base.inertia[i] = body.inertia
+            base.invInertia[i] = body.invInertia
+            base.radius[i] = body.shape.radius
+            base.staticFriction[i] = body.staticFriction
+            base.dynamicFriction[i] = body.dynamicFriction
+            base.restitution[i] = body.restitution
+        self._SetFruit(base, len(bodies), tier, 0.0, self.dropY)
+
+        tiers = [-1 if body.tier is None else body.tier for body in bodies]
+        return base, np.array(tiers + [tier])
+
+    @staticmethod
+    def _Pairs(bodies, size, group, active, quiet, pileA, pileB):
+        """
+        Overlapping pairs of the active bodies, sorted like CircleContacts.
+        In the quiet branches only the pile pairs pileA, pileB and the pairs
+        of the dropped fruit with its pile are tested.
+        """
+        position = bodies.position
+        radius = bodies.radius
+
+        first = np.flatnonzero(quiet) * size
+        A = (first[:, None] + pileA).ravel()
+        B = (first[:, None] + pileB).ravel()
+        d = position[B] - position[A]
+        r = radius[A] + radius[B]
+        pile = DotVV(d, d) < r * r
+
+        pileSlots = first[:, None] + np.arange(size - 1)
+        drops = first + size - 1
+        d = position[pileSlots] - position[drops, None]
+        r = radius[pileSlots] + radius[drops, None]
+        branch, i = np.nonzero((d * d).sum(axis=2) < r * r)
+
+        swept = np.flatnonzero(active & ~quiet[group])
+        sweptA, sweptB = CircleContacts(
+            position[swept], radius[swept], bodies.invMass[swept], group[swept]
+        )
+
+        A = np.concatenate((A[pile], first[branch] + i, swept[sweptA]))
+        B = np.concatenate((B[pile], drops[branch], swept[sweptB]))
+        order = np.lexsort((B, A))
+        return A[order], B[order]
+
+    @staticmethod
+    def _Contacts(s, walls, A, B, alive, normals, offsets):
+        """
+        Circle pairs then circles against walls, in the order of
+        World.FindContacts
+        """
+        A = A + walls
+        B = B + walls
+        if not walls:
+            return ContactBatch(s, A, B)
+
+        normal, penetration, contact = CircleGeometry(s, A, B)
+        slots = np.flatnonzero(alive) + walls
+        wall, body, wallNormal, wallPenetration, wallContact = HalfPlaneContacts(
+            s.position[slots], s.radius[slots], s.invMass[slots], normals, offsets
+        )
+        return ContactBatch(
+            s,
+            np.concatenate((A, wall)),
+            np.concatenate((B, slots[body])),
+            np.concatenate((normal, wallNormal)),
+            np.concatenate((penetration, wallPenetration)),
+            np.concatenate((contact, wallContact)),
+        )
+
+    @staticmethod
+    def _SetFruit(s, i, tier, x, y):
+        """
+        Like World.add_fruit
+        """
+        fruit = FRUITS[tier]
+        r = fruit.radius
+        s.position[i] = (x, y)
+        s.velocity[i] = 0.0
+        s.angularVelocity[i] = 0.0
+        s.radius[i] = r
+        s.mass[i] = PI * r * r * fruit.density
+        s.invMass[i] = 1.0 / s.mass[i]
+        s.inertia[i] = s.mass[i] * r * r
+        s.invInertia[i] = 1.0 / s.inertia[i]
+        s.staticFriction[i] = 0.5
+        s.dynamicFriction[i] = 0.3
+        s.restitution[i] = 0.2
+
+    def _Merge(self, s, walls, size, contacts, tiers, alive, score, running):
+        """
+        Like World.MergeFruits, the new fruit takes the slot of A and the
+        slot of B is emptied. Only the running branches score.
+        """
+        A = contacts.A - walls
+        B = contacts.B - walls
+        pairs = A >= 0
+        A = A[pairs]
+        B = B[pairs]
+        tier = tiers[A]
+        same = (tier >= 0) & (tier == tiers[B]) & (tier < len(FRUITS) - 1)
+        if not same.any():
+            return
+
+        merged = set()
+        for a, b in zip(A[same].tolist(), B[same].tolist()):
+            if a in merged or b in merged:
+                continue
+            merged.add(a)
+            merged.add(b)
+
+            i = walls + a
+            k = walls + b
+            mass = s.mass[i] + s.mass[k]
+            velocity = (s.velocity[i] * s.mass[i] + s.velocity[k] * s.mass[k]) / mass
+            x, y = (s.position[i] + s.position[k]) / 2.0
+
+            tiers[a] += 1
+            self._SetFruit(s, i, tiers[a], x, y)
+            s.velocity[i] = velocity
+            if running[a // size]:
+                score[a // size] += FRUITS[tiers[a]].score
+
+            # Empty slots are static circles of radius 0, like in BatchWorld
+            for name in BodyArrays.fields:
+                getattr(s, name)[k] = 0
+            tiers[b] = -1
+            alive[b] = False
+
+    def _Floor(self):
+        """
+        y of the highest floor among the walls, 0 without floor
+        """
+        floors = [w.position.y for w in self.world.walls if w.shape.normal.y < 0]
+        return min(floors) if floors else 0.0
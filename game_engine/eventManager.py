@@ -1,25 +1,34 @@
+import random
 import pygame as pg
-from common.shape import Circle
+from game_engine.fruit import DROP_TIERS
 
 
 class EventManager:
-    def __init__(self, world):
+    def __init__(self, world, physics=None):
         self.world = world
         self.running = True
 
+        # With a PhysicsThread, the fruits are added between two of its steps
+        self.physics = physics
+
+        # The choice of the fruits is not part of the world's random draws
+        self.rng = random.Random()
+
     def process_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT or (
                 event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE
             ):
                 self.running = False
+            elif event.type == pg.KEYDOWN and event.key == pg.K_d:
+                self.world.debugMode = not self.world.debugMode
             elif event.type == pg.MOUSEBUTTONDOWN:
                 self.handle_mouse_click(event)
 
     def handle_mouse_click(self, event):
         x, y = event.pos
-        new_circle = Circle(20)  # Radius of 20
-        self.world.add(new_circle, x, y)
+        target = self.physics if self.physics is not None else self.world
+        target.add_fruit(self.rng.randrange(DROP_TIERS), x, y)
 
     def is_running(self):
         return self.running
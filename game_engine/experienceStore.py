@@ -0,0 +1,336 @@
+import fcntl
+import json
+import os
+import time
+import numpy as np
+
+# Files of a store directory :
+#   layout.json      capacity, shape and dtype of the fields
+#   <field>.dat      one ring buffer per field, capacity rows
+#   sequence.dat     int64 per slot, number of the transition it holds,
+#                    -1 while it is being written
+#   priorities.dat   float64 per slot, for SamplePrioritized
+#   head.dat         int64, number of transitions appended since creation
+#   lock             flock taken to reserve slots
+FIELDS = ("observation", "action", "reward", "done", "nextObservation")
+
+
+class SumTree:
+    """
+    Binary tree of the sums of the priorities, leaf i holding the priority
+    of slot i. The updates and the searches are vectorized over the slots.
+    """
+
+    def __init__(self, capacity):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.tree = np.zeros(2 * self.size)
+
+    def Total(self):
+        return self.tree[1]
+
+    def Update(self, slots, values):
+        tree = self.tree
+        i = np.asarray(slots) + self.size
+        tree[i] = values
+        while self.size > 1:
+            i = np.unique(i // 2)
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            if i[0] == 1:
+                break
+
+    def Find(self, targets):
+        """
+        Slots whose range of the prefix sums holds each target
+        """
+        tree = self.tree
+        i = np.ones(len(targets), dtype=np.int64)
+        targets = np.array(targets, dtype=float)
+        while i[0] < self.size:
+            left = tree[2 * i]
+            right = targets >= left
+            targets -= left * right
+            i = 2 * i + right
+        return i - self.size
+
+
+class ExperienceStore:
+    """
+    Transitions (observation, action, reward, done, nextObservation) in
+    numpy.memmap ring buffers of a directory, see Create.
+
+    Several processes may open the same directory and Append concurrently :
+    the slots are reserved under a file lock, then written without it. A
+    slot is marked -1 in sequence while it is written and gets its
+    transition number once complete, so the samplers skip it and a process
+    killed in the middle leaves no torn transition. Reopening the directory
+    resumes from the last complete transitions. A reservation that laps a
+    slot still being written waits for it, up to writeTimeout seconds after
+    which its writer is taken as killed.
+
+    The sampled minibatches are gathered straight from the memmaps into
+    arrays allocated once per sampler and batch size, and reused by the next
+    call of the same sampler. SamplePrioritized draws in proportion to
+    priority ** alpha.
+    """
+
+    def __init__(self, directory, alpha=0.6, seed=None, writeTimeout=1.0):
+        self.directory = directory
+        self.alpha = alpha
+        self.writeTimeout = writeTimeout
+        self.rng = np.random.default_rng(seed)
+        with open(os.path.join(directory, "layout.json")) as file:
+            layout = json.load(file)
+        self.capacity = layout["capacity"]
+        self.layout = layout["fields"]
+
+        self.fields = {}
+        for name in FIELDS:
+            shape, dtype = self.layout[name]
+            self.fields[name] = np.memmap(
+                self._Path(name),
+                dtype=dtype,
+                mode="r+",
+                shape=(self.capacity,) + tuple(shape),
+            )
+        self.sequence = np.memmap(
+            self._Path("sequence"), dtype=np.int64, mode="r+", shape=(self.capacity,)
+        )
+        self.priorities = np.memmap(
+            self._Path("priorities"),
+            dtype=np.float64,
+            mode="r+",
+            shape=(self.capacity,),
+        )
+        self.head = np.memmap(self._Path("head"), dtype=np.int64, mode="r+", shape=(1,))
+        self.lockFile = open(os.path.join(directory, "lock"), "a")
+
+        self.maxPriority = max(float(self.priorities.max()), 1.0)
+        self.uniformBatches = {}
+        self.prioritizedBatches = {}
+
+        # Sum tree of the priorities of the complete slots, refreshed from
+        # the memmaps by SamplePrioritized
+        self.tree = None
+        self.treeHead = 0
+        self.pending = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def Create(
+        cls,
+        directory,
+        capacity,
+        observationShape,
+        observationDtype=np.float32,
+        actionShape=(),
+        actionDtype=np.float32,
+        **kwargs,
+    ):
+        """
+        Make the files of an empty store and open it, kwargs are passed to
+        the constructor
+        """
+        os.makedirs(directory, exist_ok=True)
+        observation = (list(observationShape), np.dtype(observationDtype).str)
+        fields = {
+            "observation": observation,
+            "action": (list(actionShape), np.dtype(actionDtype).str),
+            "reward": ([], np.dtype(np.float32).str),
+            "done": ([], np.dtype(np.bool_).str),
+            "nextObservation": observation,
+        }
+        for name in FIELDS:
+            shape, dtype = fields[name]
+            rowSize = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            with open(os.path.join(directory, name + ".dat"), "wb") as file:
+                file.truncate(capacity * rowSize)
+        with open(os.path.join(directory, "sequence.dat"), "wb") as file:
+            file.write(np.full(capacity, -1, dtype=np.int64).tobytes())
+        with open(os.path.join(directory, "priorities.dat"), "wb") as file:
+            file.truncate(8 * capacity)
+        with open(os.path.join(directory, "head.dat"), "wb") as file:
+            file.truncate(8)
+
+        # Written last, a directory without it is not a store
+        with open(os.path.join(directory, "layout.json"), "w") as file:
+            json.dump({"capacity": capacity, "fields": fields}, file)
+        return cls(directory, **kwargs)
+
+    def _Path(self, name):
+        return os.path.join(self.directory, name + ".dat")
+
+    def __len__(self):
+        """
+        Number of complete transitions held
+        """
+        return int(np.count_nonzero(self.sequence >= 0))
+
+    def Append(self, observation, action, reward, done, nextObservation):
+        """
+        Append n transitions, each argument having a leading dimension n.
+        Return their slots.
+        """
+        values = (observation, action, reward, done, nextObservation)
+        values = [np.asarray(value) for value in values]
+        count = len(values[2])
+        if count > self.capacity:
+            values = [value[-self.capacity :] for value in values]
+            count = self.capacity
+
+        deadline = time.monotonic() + self.writeTimeout
+        while True:
+            fcntl.flock(self.lockFile, fcntl.LOCK_EX)
+            try:
+                first = int(self.head[0])
+                numbers = np.arange(first, first + count)
+                slots = numbers % self.capacity
+                # Slots of the previous lap whose writer is not done, two
+                # writers of the same slot would interleave their rows
+                busy = (numbers >= self.capacity) & (self.sequence[slots] < 0)
+                if not busy.any() or time.monotonic() > deadline:
+                    self.head[0] = first + count
+                    self.sequence[slots] = -1
+                    break
+            finally:
+                fcntl.flock(self.lockFile, fcntl.LOCK_UN)
+            time.sleep(0.001)
+
+        for name, value in zip(FIELDS, values):
+            self.fields[name][slots] = value
+        self.priorities[slots] = self.maxPriority
+        self.sequence[slots] = numbers
+        return slots
+
+    def Flush(self):
+        """
+        Write the memmaps to disk, the data already survives a crash of the
+        process without it
+        """
+        for array in self.fields.values():
+            array.flush()
+        self.sequence.flush()
+        self.priorities.flush()
+        self.head.flush()
+
+    def _Batch(self, batches, batchSize):
+        batch = batches.get(batchSize)
+        if batch is None:
+            batch = {
+                name: np.empty((batchSize,) + array.shape[1:], dtype=array.dtype)
+                for name, array in self.fields.items()
+            }
+            batch["slot"] = np.empty(batchSize, dtype=np.int64)
+            batch["sequence"] = np.empty(batchSize, dtype=np.int64)
+            batch["weight"] = np.ones(batchSize)
+            batches[batchSize] = batch
+        return batch
+
+    def _Gather(self, batch, draw):
+        """
+        Fill batch with the slots given by draw(n), drawing again the rows
+        whose slot was not complete or was overwritten during the copy
+        """
+        size = len(batch["slot"])
+        rows = np.arange(size)
+        while rows.size:
+            slots = draw(rows.size)
+            seen = self.sequence[slots]
+            for name, array in self.fields.items():
+                if rows.size == size:
+                    np.take(array, slots, axis=0, out=batch[name])
+                else:
+                    batch[name][rows] = array[slots]
+            batch["slot"][rows] = slots
+            batch["sequence"][rows] = seen
+            valid = (seen >= 0) & (self.sequence[slots] == seen)
+            rows = rows[~valid]
+        return batch
+
+    def Sample(self, batchSize):
+        """
+        Uniform minibatch of complete transitions, a dict of the fields, the
+        slots, the sequence numbers and unit weights
+        """
+        # Not head, the writers killed in the middle leave incomplete slots
+        if not len(self):
+            raise ValueError("Sampling an empty store")
+        filled = min(int(self.head[0]), self.capacity)
+        batch = self._Batch(self.uniformBatches, batchSize)
+        batch["weight"][:] = 1.0
+        return self._Gather(batch, lambda n: self.rng.integers(0, filled, n))
+
+    def _RefreshTree(self):
+        """
+        Put in the sum tree the transitions appended since the last refresh,
+        and the ones that were still being written then
+        """
+        if self.tree is None:
+            self.tree = SumTree(self.capacity)
+        head = int(self.head[0])
+        oldest = head - self.capacity
+        pending = self.pending[self.pending >= oldest]
+        numbers = np.concatenate((pending, np.arange(max(self.treeHead, oldest), head)))
+        self.treeHead = head
+        if not numbers.size:
+            return
+
+        slots = numbers % self.capacity
+        complete = self.sequence[slots] == numbers
+        priorities = self.priorities[slots] ** self.alpha
+        self.tree.Update(slots, np.where(complete, priorities, 0.0))
+
+        # Until they are complete or overwritten, a writer killed in the
+        # middle leaves them pending
+        self.pending = numbers[~complete]
+
+    def SamplePrioritized(self, batchSize, beta=0.4):
+        """
+        Minibatch drawn in proportion to priority ** alpha, with the
+        importance weights (N * P) ** -beta normalized by their max in the
+        batch. The priorities are set by UpdatePriorities, the new
+        transitions get the highest one seen.
+        """
+        self._RefreshTree()
+        tree = self.tree
+        total = tree.Total()
+        if total <= 0.0:
+            raise ValueError("Sampling an empty store")
+
+        def Draw(n):
+            # One draw per stratum of the prefix sums, the rounding errors
+            # may land on an empty leaf
+            slots = np.empty(n, dtype=np.int64)
+            rows = np.arange(n)
+            while rows.size:
+                targets = (rows + self.rng.random(rows.size)) * (total / n)
+                found = tree.Find(np.minimum(targets, np.nextafter(total, 0)))
+                slots[rows] = found
+                rows = rows[tree.tree[found + tree.size] <= 0.0]
+            return slots
+
+        batch = self._Gather(self._Batch(self.prioritizedBatches, batchSize), Draw)
+        probabilities = tree.tree[batch["slot"] + tree.size] / total
+        weights = batch["weight"]
+        filled = min(int(self.head[0]), self.capacity)
+        np.power(filled * probabilities, -beta, out=weights)
+        weights /= weights.max()
+        return batch
+
+    def UpdatePriorities(self, slots, sequence, priorities):
+        """
+        New priorities of sampled transitions, typically their TD errors.
+        slots and sequence are the ones of the batch, the transitions
+        overwritten since they were sampled are skipped.
+        """
+        slots = np.asarray(slots)
+        priorities = np.asarray(priorities, dtype=float)
+        current = self.sequence[slots] == sequence
+        slots = slots[current]
+        priorities = priorities[current]
+        if not slots.size:
+            return
+        self.priorities[slots] = priorities
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
+        if self.tree is not None:
+            self.tree.Update(slots, priorities**self.alpha)
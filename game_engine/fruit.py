@@ -0,0 +1,33 @@
+from common.math import PI
+
+
+class Fruit:
+    """
+    One tier of the fruit table : two touching fruits of a tier merge into
+    one of the next tier, see World.MergeFruits
+    """
+
+    def __init__(self, name, radius, mass, score):
+        self.name = name
+        self.radius = radius
+        self.mass = mass
+        self.score = score  # Points for making this fruit by a merge
+        self.density = mass / (PI * radius * radius)
+
+
+FRUITS = (
+    Fruit("cherry", 10, 1.0, 1),
+    Fruit("strawberry", 15, 2.2, 3),
+    Fruit("grape", 20, 4.0, 6),
+    Fruit("dekopon", 25, 6.2, 10),
+    Fruit("persimmon", 30, 9.0, 15),
+    Fruit("apple", 36, 13.0, 21),
+    Fruit("pear", 42, 17.6, 28),
+    Fruit("peach", 49, 24.0, 36),
+    Fruit("pineapple", 56, 31.4, 45),
+    Fruit("melon", 64, 41.0, 55),
+    Fruit("watermelon", 74, 54.8, 66),
+)
+
+# Only the smallest fruits are dropped by the player
+DROP_TIERS = 5
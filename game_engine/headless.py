@@ -0,0 +1,29 @@
+from game_engine.clock import Clock
+
+
+class HeadlessRunner:
+    """
+    Step a world as fast as possible, without display nor the real-time
+    accumulator of main.py
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.clock = Clock()
+        self.steps = 0
+
+    def run(self, steps, callback=None):
+        """
+        Advance the world by steps steps, callback(world, step) is called
+        after each of them. Return the number of steps per second.
+        """
+        self.clock.Start()
+        for i in range(steps):
+            self.world.step()
+            if callback is not None:
+                callback(self.world, self.steps)
+            self.steps += 1
+        self.clock.Stop()
+
+        elapsed = self.clock.Difference()
+        return steps / elapsed if elapsed > 0 else float("inf")
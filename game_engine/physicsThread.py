@@ -0,0 +1,168 @@
+import threading
+import time
+from array import array
+from collections import deque
+from common.shape import CIRCLE
+
+
+class RenderState:
+    """
+    Poses of the bodies of a World before and after one step, published by
+    PhysicsThread. It is never modified once published, the renderer reads
+    it while the next one is built.
+    """
+
+    __slots__ = (
+        "step",
+        "time",
+        "bodies",
+        "sizes",
+        "previous",
+        "current",
+        "score",
+        "statsSummary",
+        "droppedTime",
+    )
+
+    def __init__(self, step, time, bodies, sizes, previous, current):
+        self.step = step
+        self.time = time  # perf_counter time at which current is due
+        self.bodies = bodies
+        self.sizes = sizes  # (typeId, radius or geometry) per body
+        self.previous = previous  # x, y, orientation per body
+        self.current = current
+        self.score = 0
+        self.statsSummary = None
+        self.droppedTime = 0.0
+
+    def Poses(self, alpha):
+        """
+        Like WorldPoses of the renderer, interpolated from the poses before
+        the step (alpha 0) to the poses after it (alpha 1)
+        """
+        previous = self.previous
+        current = self.current
+        beta = 1.0 - alpha
+        for i, body in enumerate(self.bodies):
+            typeId, size = self.sizes[i]
+            k = 3 * i
+            yield (
+                body,
+                typeId,
+                size,
+                beta * previous[k] + alpha * current[k],
+                beta * previous[k + 1] + alpha * current[k + 1],
+                beta * previous[k + 2] + alpha * current[k + 2],
+            )
+
+
+class PhysicsThread:
+    """
+    Steps a world at a fixed dt in real time on its own thread, so that a
+    slow frame does not delay the simulation, and publishes a RenderState
+    after each step.
+
+    Publishing swaps the front state under a lock, the renderer takes the
+    latest one with Latest and draws it while the next one is built.
+    Changes to the world must go through Schedule, they are applied between
+    two steps. When the steps are slower than dt for more than maxLag
+    seconds, the late time is skipped and added to droppedTime.
+    """
+
+    def __init__(self, world, maxLag=0.25):
+        self.world = world
+        self.maxLag = maxLag
+        self.droppedTime = 0.0
+        self.steps = 0
+
+        self.commands = deque()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+        # Pose of each body at the last publish, body -> (x, y, orientation)
+        self.poses = {}
+        self.front = self.Publish(time.perf_counter())
+
+    def Start(self):
+        self.thread.start()
+
+    def Stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def Schedule(self, function):
+        """
+        Call function(world) on the physics thread before the next step
+        """
+        self.commands.append(function)
+
+    def add_fruit(self, tier, x, y):
+        self.Schedule(lambda world: world.add_fruit(tier, x, y))
+
+    def Latest(self) -> RenderState:
+        with self.lock:
+            return self.front
+
+    def Alpha(self, state: RenderState, now=None):
+        """
+        Fraction of dt elapsed since the poses after the step of state were
+        due, clamped to [0, 1]
+        """
+        if now is None:
+            now = time.perf_counter()
+        alpha = (now - state.time) / self.world.dt
+        return min(max(alpha, 0.0), 1.0)
+
+    def run(self):
+        dt = self.world.dt
+        due = self.front.time
+        while not self.stopped.is_set():
+            due += dt
+            delay = due - time.perf_counter()
+            if delay > 0.0:
+                self.stopped.wait(delay)
+            elif -delay > self.maxLag:
+                self.droppedTime -= delay
+                due -= delay
+
+            while self.commands:
+                self.commands.popleft()(self.world)
+            self.world.step()
+            self.steps += 1
+
+            state = self.Publish(due)
+            with self.lock:
+                self.front = state
+
+    def Publish(self, due) -> RenderState:
+        """
+        RenderState of the world, a body that was not there at the last
+        publish does not move during the step
+        """
+        bodies = tuple(self.world.get_bodies())
+        sizes = []
+        previous = array("d")
+        current = array("d")
+        last = self.poses
+        poses = {}
+        for body in bodies:
+            shape = body.shape
+            if shape.typeId == CIRCLE:
+                sizes.append((CIRCLE, shape.radius))
+            else:
+                sizes.append((shape.typeId, shape.geometry))
+            pose = (body.position.x, body.position.y, body.orientation)
+            poses[body] = pose
+            current.extend(pose)
+            previous.extend(last.get(body, pose))
+        self.poses = poses
+
+        state = RenderState(self.steps, due, bodies, tuple(sizes), previous, current)
+        state.score = self.world.score
+        state.droppedTime = self.droppedTime
+        stats = self.world.stats
+        if stats is not None and self.world.debugMode:
+            state.statsSummary = stats.Summary()
+        return state
@@ -0,0 +1,238 @@
+import hashlib
+import struct
+from common.shape import CIRCLE, POLYGON, Circle, Polygon, PolygonGeometry
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+# File layout, little endian :
+#   header : MAGIC, version, seed, dt, iterations, warmStarting, allowSleep
+#   records : a tag byte followed by
+#     ADD   step, x, y, shape type, parameter count, parameters : the
+#           radius of a circle, the vertices then the normals of a polygon
+#           as given to World.add
+#     FRUIT step, x, y, tier
+#     WALL  step, x, y, nx, ny
+#     HASH  step, state hash after the step
+#     END   number of steps
+MAGIC = b"SKRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBQdIBB")
+ADD = b"A"
+ADD_RECORD = struct.Struct("<IddBH")
+FRUIT = b"F"
+FRUIT_RECORD = struct.Struct("<IddB")
+WALL = b"W"
+WALL_RECORD = struct.Struct("<Idddd")
+HASH = b"H"
+HASH_RECORD = struct.Struct("<I8s")
+END = b"E"
+END_RECORD = struct.Struct("<I")
+
+
+def StateHash(world: World) -> bytes:
+    """
+    Hash of the exact state of all the bodies
+    """
+    return hashlib.blake2b(world.snapshot().data.tobytes(), digest_size=8).digest()
+
+
+def _ShapeParameters(shape):
+    if shape.typeId == CIRCLE:
+        return CIRCLE, [shape.radius]
+    geometry = shape.geometry
+    return POLYGON, list(geometry.vertices) + list(geometry.normals)
+
+
+def _MakeShape(shapeType, parameters):
+    if shapeType == CIRCLE:
+        return Circle(parameters[0])
+    # The geometry as it was logged, Set would reorder the hull
+    half = len(parameters) // 2
+    shape = Polygon()
+    shape.SetGeometry(PolygonGeometry.Intern(parameters[:half], parameters[half:]))
+    return shape
+
+
+class ReplayRecorder:
+    """
+    Drive a seeded world and log the seed and the add actions, with the
+    state hash after each step to check the replays.
+
+    Forwards the other attributes to the world so it can be used in place of
+    it, by the Renderer or the EventManager for example.
+    """
+
+    def __init__(self, world: World, path, hashes=True):
+        if world.seed is None:
+            raise ValueError("Only a seeded world can be replayed")
+        # random.Random uses the absolute value of an int seed
+        if not isinstance(world.seed, int) or abs(world.seed) >= 1 << 64:
+            raise ValueError("Only the int seeds of 64 bits can be replayed")
+        if world.bodies or world.walls:
+            raise ValueError("The world must be recorded from the start")
+
+        self.world = world
+        self.hashes = hashes
+        self.steps = 0
+        self.file = open(path, "wb")
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                abs(world.seed),
+                world.dt,
+                world.iterations,
+                world.contactCache is not None,
+                world.allowSleep,
+            )
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.world, name)
+
+    def add(self, shape, x, y):
+        # Before the body centers the polygon on its centroid, the replay
+        # does it again
+        shapeType, parameters = _ShapeParameters(shape)
+        body = self.world.add(shape, x, y)
+        self.file.write(
+            ADD + ADD_RECORD.pack(self.steps, x, y, shapeType, len(parameters))
+        )
+        self.file.write(struct.pack("<{}d".format(len(parameters)), *parameters))
+        return body
+
+    def add_fruit(self, tier, x, y):
+        body = self.world.add_fruit(tier, x, y)
+        self.file.write(FRUIT + FRUIT_RECORD.pack(self.steps, x, y, tier))
+        return body
+
+    def add_wall(self, x, y, nx, ny):
+        wall = self.world.add_wall(x, y, nx, ny)
+        self.file.write(WALL + WALL_RECORD.pack(self.steps, x, y, nx, ny))
+        return wall
+
+    def add_container(self, width, height, thickness=0.0):
+        walls = self.world.add_container(width, height, thickness)
+        for wall in walls:
+            self.file.write(
+                WALL
+                + WALL_RECORD.pack(
+                    self.steps,
+                    wall.position.x,
+                    wall.position.y,
+                    wall.shape.normal.x,
+                    wall.shape.normal.y,
+                )
+            )
+        return walls
+
+    def step(self):
+        self.world.step()
+        if self.hashes:
+            stateHash = StateHash(self.world)
+            self.file.write(HASH + HASH_RECORD.pack(self.steps, stateHash))
+        self.steps += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(END + END_RECORD.pack(self.steps))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def ReadReplay(path):
+    """
+    Return the world settings and the list of records of a log :
+    (ADD, step, shape, x, y), (FRUIT, step, x, y, tier),
+    (WALL, step, x, y, nx, ny), (HASH, step, hash) and (END, steps)
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError("{} is not a replay log".format(path))
+    header = HEADER.unpack_from(data)
+    magic, version, seed, dt, iterations, warmStarting, allowSleep = header
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a replay log".format(path))
+    settings = {
+        "seed": seed,
+        "dt": dt,
+        "iterations": iterations,
+        "warmStarting": bool(warmStarting),
+        "allowSleep": bool(allowSleep),
+    }
+
+    records = []
+    offset = HEADER.size
+    while offset < len(data):
+        tag = data[offset : offset + 1]
+        offset += 1
+        if tag == ADD:
+            step, x, y, shapeType, count = ADD_RECORD.unpack_from(data, offset)
+            offset += ADD_RECORD.size
+            parameters = struct.unpack_from("<{}d".format(count), data, offset)
+            offset += 8 * count
+            records.append((ADD, step, _MakeShape(shapeType, parameters), x, y))
+        elif tag == FRUIT:
+            records.append((FRUIT,) + FRUIT_RECORD.unpack_from(data, offset))
+            offset += FRUIT_RECORD.size
+        elif tag == WALL:
+            records.append((WALL,) + WALL_RECORD.unpack_from(data, offset))
+            offset += WALL_RECORD.size
+        elif tag == HASH:
+            records.append((HASH,) + HASH_RECORD.unpack_from(data, offset))
+            offset += HASH_RECORD.size
+        elif tag == END:
+            records.append((END,) + END_RECORD.unpack_from(data, offset))
+            offset += END_RECORD.size
+        else:
+            raise ValueError("Corrupted replay log {} at {}".format(path, offset - 1))
+
+    return settings, records
+
+
+def Replay(path, verify=True):
+    """
+    Re-simulate a log as fast as possible.
+
+    Return the world and the first step whose state hash does not match the
+    log (None if they all match).
+    """
+    settings, records = ReadReplay(path)
+    world = World(
+        settings["dt"],
+        settings["iterations"],
+        SweepAndPrune(),
+        settings["warmStarting"],
+        settings["allowSleep"],
+        settings["seed"],
+    )
+
+    steps = 0
+    for record in records:
+        tag = record[0]
+        target = record[1]
+        while steps < target:
+            world.step()
+            steps += 1
+
+        if tag == ADD:
+            world.add(record[2], record[3], record[4])
+        elif tag == FRUIT:
+            world.add_fruit(record[4], record[2], record[3])
+        elif tag == WALL:
+            world.add_wall(*record[2:])
+        elif tag == HASH:
+            world.step()
+            steps += 1
+            if verify and StateHash(world) != record[2]:
+                return world, target
+
+    return world, None
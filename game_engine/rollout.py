@@ -0,0 +1,226 @@
+import math
+import random
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from game_engine.fruit import DROP_TIERS, FRUITS
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+OBSERVATION_SIZE = 5  # x, y, vx, vy, radius
+
+
+def _Buffers(shm, envCount, maxBodies):
+    """
+    numpy views on the shared memory block :
+    actions, observations, rewards, dones
+    """
+    shapes = [
+        ((envCount,), np.float64),
+        ((envCount, maxBodies, OBSERVATION_SIZE), np.float64),
+        ((envCount,), np.float64),
+        ((envCount,), np.bool_),
+    ]
+    buffers = []
+    offset = 0
+    for shape, dtype in shapes:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        offset += array.nbytes
+        buffers.append(array)
+    return buffers
+
+
+def _BufferSize(envCount, maxBodies):
+    return envCount * (8 + maxBodies * OBSERVATION_SIZE * 8 + 8 + 1)
+
+
+class _Env:
+    """
+    One headless World in a container, each episode gets a seed drawn from
+    the env's own random state so that its simulation does not depend on the
+    other worlds stepped by the same process. The tiers of the dropped
+    fruits are drawn from it too, like SuikaEnv.
+    """
+
+    def __init__(self, seed, config):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.Reset()
+
+    def Reset(self):
+        c = self.config
+        self.world = World(
+            c["dt"], c["iterations"], SweepAndPrune(), seed=self.rng.getrandbits(64)
+        )
+        self.world.add_container(c["width"], c["height"])
+        self.nextTier = self.rng.randrange(DROP_TIERS)
+        self.done = False
+
+    def Step(self, action):
+        c = self.config
+        world = self.world
+        bodies = world.get_bodies()
+
+        if not self.done and not math.isnan(action) and len(bodies) < c["maxBodies"]:
+            radius = FRUITS[self.nextTier].radius
+            x = min(max(float(action), radius), c["width"] - radius)
+            world.add_fruit(self.nextTier, x, c["dropY"])
+            self.nextTier = self.rng.randrange(DROP_TIERS)
+
+        score = world.score
+        world.step()
+
+        for body in bodies:
+            if body.position.y - body.shape.radius > c["height"]:
+                self.done = True
+        if len(bodies) >= c["maxBodies"]:
+            self.done = True
+
+        return world.score - score
+
+    def Observe(self, out):
+        out[:] = 0
+        for i, body in enumerate(self.world.get_bodies()):
+            out[i] = (
+                body.position.x,
+                body.position.y,
+                body.velocity.x,
+                body.velocity.y,
+                body.shape.radius,
+            )
+
+
+def _Worker(conn, name, envCount, first, last, seed, config):
+    shm = shared_memory.SharedMemory(name=name)
+    actions, observations, rewards, dones = _Buffers(
+        shm, envCount, config["maxBodies"]
+    )
+    envs = {k: _Env(seed + k, config) for k in range(first, last)}
+
+    while True:
+        command, args = conn.recv()
+        if command == "step":
+            for k, env in envs.items():
+                rewards[k] = env.Step(actions[k])
+                dones[k] = env.done
+                env.Observe(observations[k])
+        elif command == "reset":
+            for k in args:
+                if k in envs:
+                    envs[k].Reset()
+                    dones[k] = False
+                    envs[k].Observe(observations[k])
+        conn.send(None)
+        if command == "close":
+            break
+
+    del actions, observations, rewards, dones
+    shm.close()
+
+
+class RolloutRunner:
+    """
+    Step envCount headless worlds split over workerCount processes.
+
+    The actions and observations go through a shared memory block, the
+    processes only exchange a short command per call. Each world is seeded
+    with seed + its index, so the results do not depend on workerCount.
+
+    An action is the x coordinate where the next fruit is dropped, NaN for no
+    drop. The reward is the score of the merges.
+    """
+
+    def __init__(
+        self,
+        envCount,
+        workerCount,
+        seed=0,
+        dt=1.0 / 60.0,
+        iterations=10,
+        maxBodies=64,
+        width=800,
+        height=600,
+        dropY=50,
+    ):
+        self.envCount = envCount
+        config = {
+            "dt": dt,
+            "iterations": iterations,
+            "maxBodies": maxBodies,
+            "width": width,
+            "height": height,
+            "dropY": dropY,
+        }
+
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=_BufferSize(envCount, maxBodies)
+        )
+        self.actions, self.observations, self.rewards, self.dones = _Buffers(
+            self.shm, envCount, maxBodies
+        )
+        self.observations[:] = 0
+        self.dones[:] = False
+
+        workerCount = max(1, min(workerCount, envCount))
+        bounds = np.linspace(0, envCount, workerCount + 1).astype(int)
+        self.connections = []
+        self.workers = []
+        for w in range(workerCount):
+            parent, child = mp.Pipe()
+            worker = mp.Process(
+                target=_Worker,
+                args=(
+                    child,
+                    self.shm.name,
+                    envCount,
+                    bounds[w],
+                    bounds[w + 1],
+                    seed,
+                    config,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+    def _Run(self, command, args=None):
+        for conn in self.connections:
+            conn.send((command, args))
+        for conn in self.connections:
+            conn.recv()
+
+    def reset(self, envs=None):
+        """
+        Recreate the given worlds (the finished ones by default)
+        """
+        if envs is None:
+            envs = np.flatnonzero(self.dones)
+        self._Run("reset", [int(k) for k in envs])
+        return self.observations
+
+    def step(self, actions):
+        """
+        Return the observations, rewards and done flags. The arrays are views
+        on the shared memory and are overwritten by the next call.
+        """
+        self.actions[:] = actions
+        self._Run("step")
+        return self.observations, self.rewards, self.dones
+
+    def close(self):
+        if self.shm is None:
+            return
+        self._Run("close")
+        for worker in self.workers:
+            worker.join()
+        del self.actions, self.observations, self.rewards, self.dones
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,75 @@
+from collections import deque
+
+PHASES = (
+    "FindContacts",
+    "SolveContacts",
+    "IntegrateVelocities",
+    "CorrectPositions",
+    "FinishMotion",
+    "MergeFruits",
+)
+COUNTERS = ("pairsTested", "contacts", "impulseIterations", "bodiesIntegrated")
+
+
+class StepStats:
+    """
+    Timings of the phases of World.step and counters over the last window
+    steps
+    """
+
+    def __init__(self, window=120):
+        self.window = window
+        self.timings = {name: deque(maxlen=window) for name in PHASES + ("step",)}
+        self.counters = {name: deque(maxlen=window) for name in COUNTERS}
+        self.steps = 0
+
+    def Record(self, timings, counters):
+        """
+        timings : seconds per phase, counters : value per counter
+        """
+        total = 0.0
+        for name in PHASES:
+            self.timings[name].append(timings[name])
+            total += timings[name]
+        self.timings["step"].append(total)
+        for name in COUNTERS:
+            self.counters[name].append(counters[name])
+        self.steps += 1
+
+    @staticmethod
+    def Percentile(samples, p):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    def TimingPercentile(self, name, p) -> float:
+        """
+        p-th percentile of the phase duration in milliseconds
+        """
+        return 1000.0 * self.Percentile(self.timings[name], p)
+
+    def Last(self, name):
+        samples = self.counters[name]
+        return samples[-1] if samples else 0
+
+    def Summary(self):
+        """
+        One line per phase and one for the counters
+        """
+        lines = []
+        for name in ("step",) + PHASES:
+            lines.append(
+                "{:20s} p50 {:6.2f}ms p95 {:6.2f}ms p99 {:6.2f}ms".format(
+                    name,
+                    self.TimingPercentile(name, 50),
+                    self.TimingPercentile(name, 95),
+                    self.TimingPercentile(name, 99),
+                )
+            )
+        lines.append(
+            "pairs {} contacts {} iterations {} bodies {}".format(
+                *(self.Last(name) for name in COUNTERS)
+            )
+        )
+        return lines
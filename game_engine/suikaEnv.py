@@ -0,0 +1,135 @@
+import random
+from operator import attrgetter
+import numpy as np
+from game_engine.fruit import DROP_TIERS, FRUITS
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+OBSERVATION_FIELDS = (
+    "position.x",
+    "position.y",
+    "velocity.x",
+    "velocity.y",
+    "shape.radius",
+    "tier",
+)
+_getters = [attrgetter(name) for name in OBSERVATION_FIELDS]
+
+
+class SuikaEnv:
+    """
+    Gymnasium-style environment : the player drops the next fruit at the x
+    coordinate given as action, then the world is stepped frameSkip times
+    (or until it settles if frameSkip is None).
+
+    The observation is a dict of arrays allocated once and filled in place
+    at each call, copy them to keep them :
+        bodies   (maxBodies, 6) x, y, vx, vy, radius, tier of each fruit,
+                 zeros and tier -1 after the last one
+        mask     (maxBodies,) True for the rows holding a fruit
+        nextTier (1,) tier of the fruit to drop
+
+    The reward is the score of the merges. The episode terminates when a
+    fruit other than the one just dropped rests (speed below restSpeed)
+    sticking out above limitY, and is truncated when the fruits do not fit
+    in maxBodies rows anymore.
+    """
+
+    def __init__(
+        self,
+        width=800,
+        height=600,
+        dropY=50,
+        limitY=100,
+        frameSkip=60,
+        maxBodies=128,
+        dt=1.0 / 60.0,
+        iterations=10,
+        maxSettleSteps=600,
+        restSpeed=5.0,
+    ):
+        self.width = width
+        self.height = height
+        self.dropY = dropY
+        self.limitY = limitY
+        self.frameSkip = frameSkip
+        self.maxBodies = maxBodies
+        self.dt = dt
+        self.iterations = iterations
+        self.maxSettleSteps = maxSettleSteps
+        self.restSpeed = restSpeed
+
+        self.observation = {
+            "bodies": np.zeros((maxBodies, len(OBSERVATION_FIELDS))),
+            "mask": np.zeros(maxBodies, dtype=bool),
+            "nextTier": np.zeros(1, dtype=np.int64),
+        }
+        self.world = None
+        self.rng = random.Random()
+        self.nextTier = 0
+
+    def reset(self, seed=None):
+        """
+        Start a new episode, return the observation and an info dict
+        """
+        # The choice of the fruits is not part of the world's random draws
+        if seed is not None:
+            self.rng.seed(seed)
+        self.world = World(
+            self.dt, self.iterations, SweepAndPrune(), seed=self.rng.getrandbits(64)
+        )
+        self.world.add_container(self.width, self.height)
+        self.nextTier = self.rng.randrange(DROP_TIERS)
+        return self.observe(), self.info()
+
+    def step(self, action):
+        """
+        Drop the next fruit at x = action.
+
+        Return the observation, reward, terminated, truncated and info
+        """
+        world = self.world
+        radius = FRUITS[self.nextTier].radius
+        x = min(max(float(action), radius), self.width - radius)
+        fruit = world.add_fruit(self.nextTier, x, self.dropY)
+        self.nextTier = self.rng.randrange(DROP_TIERS)
+
+        score = world.score
+        if self.frameSkip is None:
+            world.settle(self.maxSettleSteps)
+        else:
+            for i in range(self.frameSkip):
+                world.step()
+        reward = world.score - score
+
+        terminated = False
+        restSpeedSqr = self.restSpeed * self.restSpeed
+        for body in world.get_bodies():
+            if (
+                body is not fruit
+                and body.position.y - body.shape.radius < self.limitY
+                and body.velocity.LenSqr() < restSpeedSqr
+            ):
+                terminated = True
+                break
+        truncated = len(world.get_bodies()) > self.maxBodies
+
+        return self.observe(), reward, terminated, truncated, self.info()
+
+    def observe(self):
+        bodies = self.world.get_bodies()
+        count = min(len(bodies), self.maxBodies)
+        out = self.observation["bodies"]
+        for column, getter in enumerate(_getters):
+            out[:count, column] = np.fromiter(map(getter, bodies), float, count)
+        out[count:] = 0.0
+        out[count:, 5] = -1
+
+        mask = self.observation["mask"]
+        mask[:count] = True
+        mask[count:] = False
+        self.observation["nextTier"][0] = self.nextTier
+        return self.observation
+
+    def info(self):
+        return {"score": self.world.score, "bodies": len(self.world.get_bodies())}
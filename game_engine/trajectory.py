@@ -0,0 +1,237 @@
+import math
+import struct
+from operator import attrgetter
+import numpy as np
+from common.shape import CIRCLE
+
+# File layout, little endian, appended chunk by chunk :
+#   header : MAGIC, version, dt, wall count, then x, y, nx, ny per wall
+#   chunks : CHUNK_MAGIC, first step, step count, row count, then
+#            one STEP_DTYPE entry per step (its first row in the chunk, its
+#            row count and the score after it) and the BODY_DTYPE rows
+# A chunk is only written once complete, a file cut by a crash loses at
+# most the chunk being written.
+MAGIC = b"SKTJ"
+VERSION = 1
+HEADER = struct.Struct("<4sBdH")
+WALL_RECORD = struct.Struct("<dddd")
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIII")
+
+STEP_DTYPE = np.dtype([("row", "<u4"), ("count", "<u4"), ("score", "<f8")])
+
+# Polygons are recorded with the radius of their bounding circle. The id of a
+# body stays the same for the whole trajectory, tier is -1 for the bodies
+# that are not fruits.
+BODY_DTYPE = np.dtype(
+    [
+        ("id", "<u4"),
+        ("typeId", "u1"),
+        ("tier", "i1"),
+        ("radius", "<f4"),
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("orientation", "<f4"),
+        ("vx", "<f4"),
+        ("vy", "<f4"),
+        ("angularVelocity", "<f4"),
+    ]
+)
+
+_typeId = attrgetter("shape.typeId")
+_x = attrgetter("position.x")
+_y = attrgetter("position.y")
+_orientation = attrgetter("orientation")
+_vx = attrgetter("velocity.x")
+_vy = attrgetter("velocity.y")
+_angularVelocity = attrgetter("angularVelocity")
+
+
+def _Tier(body):
+    return -1 if body.tier is None else body.tier
+
+
+def _Radius(body):
+    shape = body.shape
+    if shape.typeId == CIRCLE:
+        return shape.radius
+    vertices = shape.geometry.vertices
+    xs = vertices[0::2]
+    ys = vertices[1::2]
+    return math.sqrt(max(x * x + y * y for x, y in zip(xs, ys)))
+
+
+class _Ids(dict):
+    """
+    body -> id, in the order the bodies are first seen
+    """
+
+    def __missing__(self, body):
+        index = self[body] = len(self)
+        return index
+
+
+class TrajectoryRecorder:
+    """
+    Append the state of the bodies of a world after each step to a
+    trajectory file, see TrajectoryReader.
+
+    The steps are buffered in memory and written chunkSteps at a time, the
+    per-step cost is a few numpy fills. Call Record after each step, or pass
+    the recorder as callback to HeadlessRunner.run.
+    """
+
+    def __init__(self, world, path, chunkSteps=256):
+        self.world = world
+        self.chunkSteps = chunkSteps
+        self.steps = 0
+        self.ids = _Ids()
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, world.dt, len(world.walls)))
+        for wall in world.walls:
+            normal = wall.shape.normal
+            self.file.write(
+                WALL_RECORD.pack(wall.position.x, wall.position.y, normal.x, normal.y)
+            )
+
+        self.stepTable = np.zeros(chunkSteps, dtype=STEP_DTYPE)
+        self.rows = np.zeros(chunkSteps * 64, dtype=BODY_DTYPE)
+        self.chunkFirstStep = 0
+        self.buffered = 0
+        self.rowCount = 0
+
+    def __call__(self, world, step):
+        self.Record()
+
+    def Record(self):
+        """
+        Buffer the state of the bodies after the last step
+        """
+        bodies = self.world.get_bodies()
+        count = len(bodies)
+        start = self.rowCount
+        end = start + count
+        if end > len(self.rows):
+            rows = np.zeros(max(2 * len(self.rows), end), dtype=BODY_DTYPE)
+            rows[:start] = self.rows[:start]
+            self.rows = rows
+
+        rows = self.rows[start:end]
+        rows["id"] = np.fromiter(map(self.ids.__getitem__, bodies), np.uint32, count)
+        rows["typeId"] = np.fromiter(map(_typeId, bodies), np.uint8, count)
+        rows["tier"] = np.fromiter(map(_Tier, bodies), np.int8, count)
+        rows["radius"] = np.fromiter(map(_Radius, bodies), float, count)
+        rows["x"] = np.fromiter(map(_x, bodies), float, count)
+        rows["y"] = np.fromiter(map(_y, bodies), float, count)
+        rows["orientation"] = np.fromiter(map(_orientation, bodies), float, count)
+        rows["vx"] = np.fromiter(map(_vx, bodies), float, count)
+        rows["vy"] = np.fromiter(map(_vy, bodies), float, count)
+        rows["angularVelocity"] = np.fromiter(
+            map(_angularVelocity, bodies), float, count
+        )
+
+        entry = self.stepTable[self.buffered]
+        entry["row"] = start
+        entry["count"] = count
+        entry["score"] = self.world.score
+        self.rowCount = end
+        self.buffered += 1
+        self.steps += 1
+        if self.buffered == self.chunkSteps:
+            self.Flush()
+
+    def Flush(self):
+        """
+        Write the buffered steps as one chunk
+        """
+        if not self.buffered:
+            return
+        self.file.write(
+            CHUNK_HEADER.pack(
+                CHUNK_MAGIC, self.chunkFirstStep, self.buffered, self.rowCount
+            )
+        )
+        self.file.write(self.stepTable[: self.buffered].tobytes())
+        self.file.write(self.rows[: self.rowCount].tobytes())
+        self.file.flush()
+        self.chunkFirstStep = self.steps
+        self.buffered = 0
+        self.rowCount = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.Flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    Memory-mapped view of a trajectory file, the steps are read in place
+    without loading the file. A chunk cut by a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+
+        magic, version, dt, wallCount = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a trajectory file".format(path))
+        self.dt = dt
+        offset = HEADER.size
+        self.walls = [
+            WALL_RECORD.unpack_from(self.data, offset + i * WALL_RECORD.size)
+            for i in range(wallCount)
+        ]
+        offset += wallCount * WALL_RECORD.size
+
+        # Index of the chunks by their first step
+        firstSteps = []
+        self.stepTables = []
+        self.chunkRows = []
+        while offset + CHUNK_HEADER.size <= len(self.data):
+            magic, first, steps, rows = CHUNK_HEADER.unpack_from(self.data, offset)
+            if magic != CHUNK_MAGIC:
+                raise ValueError("Corrupted trajectory {} at {}".format(path, offset))
+            tableStart = offset + CHUNK_HEADER.size
+            rowsStart = tableStart + steps * STEP_DTYPE.itemsize
+            end = rowsStart + rows * BODY_DTYPE.itemsize
+            if end > len(self.data):
+                break
+            firstSteps.append(first)
+            self.stepTables.append(self.data[tableStart:rowsStart].view(STEP_DTYPE))
+            self.chunkRows.append(self.data[rowsStart:end].view(BODY_DTYPE))
+            offset = end
+
+        self.firstSteps = np.array(firstSteps, dtype=np.int64)
+        self.steps = (
+            int(self.firstSteps[-1]) + len(self.stepTables[-1]) if firstSteps else 0
+        )
+
+    def __len__(self):
+        return self.steps
+
+    def _Entry(self, step):
+        if not 0 <= step < self.steps:
+            raise IndexError("step {} out of {}".format(step, self.steps))
+        chunk = int(np.searchsorted(self.firstSteps, step, side="right")) - 1
+        return chunk, self.stepTables[chunk][step - self.firstSteps[chunk]]
+
+    def Step(self, step):
+        """
+        BODY_DTYPE rows of the bodies after the given step, a view on the file
+        """
+        chunk, entry = self._Entry(step)
+        row = int(entry["row"])
+        return self.chunkRows[chunk][row : row + int(entry["count"])]
+
+    def Score(self, step):
+        return float(self._Entry(step)[1]["score"])
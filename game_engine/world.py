@@ -1,45 +1,393 @@
+import math
+import random
+import time
+from array import array
 from common.math import *
 from physic_engine.body import *
 from physic_engine.manifold import *
+from physic_engine.broadphase import BruteForce
+from physic_engine.contactCache import ContactCache
+from game_engine.fruit import FRUITS
+
+
+class WorldSnapshot:
+    """
+    State of a World : the body references and one flat buffer holding
+    the state of all the bodies, see World.snapshot
+    """
+
+    def __init__(
+        self, bodies, data, score, rngState, contactImpulses, islands, geometries
+    ):
+        self.bodies = bodies
+        self.data = data
+        self.score = score
+        self.rngState = rngState
+        self.contactImpulses = contactImpulses
+        self.islands = islands
+        self.geometries = geometries  # PolygonGeometry of the polygons
 
 
 class World:
-    def __init__(self, dt, iterations):
+    def __init__(
+        self,
+        dt,
+        iterations,
+        broadphase=None,
+        warmStarting=False,
+        allowSleep=False,
+        seed=None,
+        stats=None,
+    ):
         self.debugMode = False
         self.dt = dt
         self.iterations = iterations
+        self.broadphase = broadphase if broadphase is not None else BruteForce()
+
+        # Reuse the impulses of the previous step, see ContactCache
+        self.contactCache = ContactCache() if warmStarting else None
+
+        # Put the islands of resting bodies to sleep, see UpdateSleep
+        self.allowSleep = allowSleep
+        self.sleepLinearVelocity = 5.0
+        self.sleepAngularVelocity = 0.1
+        self.timeToSleep = 0.5
+        self.activeCount = 0
+        self.sleepingCount = 0
 
         self.bodies = []
         self.contacts = []
 
+        # Static half-planes, kept out of the broadphase, see CollideWalls
+        self.walls = []
+        self.pairsTested = 0
+
+        # Motion left after the last step, see settle. The kinetic energy is
+        # only measured while measureEnergy is set.
+        self.measureEnergy = False
+        self.kineticEnergy = 0.0
+        self.maxSpecificEnergy = 0.0  # Largest kinetic energy per unit of mass
+        self.maxPenetration = 0.0
+
+        # Optional StepStats, filled by each step
+        self.stats = stats
+
         self.gravityScale = 5
         self.gravity = Vec2(0, 9.81 * self.gravityScale)
 
         self.score = 0
+        self.merges = []  # Fruits made by the merges of the last step
+
+        # Every random draw of the world comes from here, so that a seeded
+        # world is reproducible. Draw the game's own choices from another
+        # generator, replays only record the seed and the added bodies.
+        self.seed = seed
+        self.rng = random.Random(seed)
 
     def get_bodies(self):
         return self.bodies
 
     def add(self, shape, x, y):
-        body = Body(shape, x, y)
+        body = Body(shape, x, y, math.radians(self.rng.randint(0, 360)))
+        body.index = len(self.bodies)
         self.bodies.append(body)
+        return body
+
+    def add_fruit(self, tier, x, y):
+        """
+        Add a fruit of FRUITS[tier], it merges with the fruits of the same
+        tier it touches
+        """
+        fruit = FRUITS[tier]
+        body = self.add(Circle(fruit.radius), x, y)
+        body.shape.ComputeMass(fruit.density)
+        body.tier = tier
+        return body
+
+    def add_wall(self, x, y, nx, ny):
+        """
+        Static half-plane through (x, y), bodies are kept on the side of the
+        normal (nx, ny). The walls are not in bodies.
+        """
+        wall = Body(HalfPlane(Vec2(nx, ny)), x, y, 0.0)
+        self.walls.append(wall)
+        return wall
+
+    def add_container(self, width, height, thickness=0.0):
+        """
+        Floor and two walls, open at the top, thickness inside the window
+        """
+        return [
+            self.add_wall(width / 2, height - thickness, 0.0, -1.0),
+            self.add_wall(thickness, height / 2, 1.0, 0.0),
+            self.add_wall(width - thickness, height / 2, -1.0, 0.0),
+        ]
+
+    def remove(self, body):
+        """
+        Swap-remove in O(1), the last body takes the place of the removed one
+        """
+        # The bodies resting on it must fall
+        body.SetAwake(True)
+
+        last = self.bodies.pop()
+        if last is not body:
+            self.bodies[body.index] = last
+            last.index = body.index
+        body.index = -1
+
+    def snapshot(self) -> WorldSnapshot:
+        """
+        Capture the state of all the bodies, restore puts it back
+        """
+        data = []
+        geometries = []
+        for b in self.bodies:
+            data += (
+                b.position.x,
+                b.position.y,
+                b.velocity.x,
+                b.velocity.y,
+                b.orientation,
+                b.angularVelocity,
+                b.force.x,
+                b.force.y,
+                b.torque,
+                b.mass,
+                b.invMass,
+                b.inertia,
+                b.invInertia,
+                b.staticFriction,
+                b.dynamicFriction,
+                b.restitution,
+                b.awake,
+                b.sleepTime,
+            )
+
+            shape = b.shape
+            if shape.typeId == CIRCLE:
+                data.append(shape.radius)
+            elif shape.typeId == POLYGON:
+                geometry = shape.geometry
+                geometries.append(geometry)
+                data.append(geometry.count)
+                for i in range(0, 2 * geometry.count, 2):
+                    data += (
+                        geometry.vertices[i],
+                        geometry.vertices[i + 1],
+                        geometry.normals[i],
+                        geometry.normals[i + 1],
+                    )
+
+        return WorldSnapshot(
+            tuple(self.bodies),
+            array("d", data),
+            self.score,
+            self.rng.getstate(),
+            self.contactCache.impulses if self.contactCache is not None else None,
+            tuple(b.island for b in self.bodies) if self.allowSleep else None,
+            tuple(geometries),
+        )
+
+    def restore(self, snapshot: WorldSnapshot) -> None:
+        """
+        Put back the state captured by snapshot. The bodies are updated in
+        place, the ones added since are dropped.
+        """
+        self.bodies[:] = snapshot.bodies
+        self.merges.clear()
+        data = snapshot.data
+        geometries = iter(snapshot.geometries)
+        k = 0
+        for index, b in enumerate(self.bodies):
+            b.index = index
+            b.position.Set(data[k], data[k + 1])
+            b.velocity.Set(data[k + 2], data[k + 3])
+            b.orientation = data[k + 4]
+            b.angularVelocity = data[k + 5]
+            b.force.Set(data[k + 6], data[k + 7])
+            b.torque = data[k + 8]
+            b.mass = data[k + 9]
+            b.invMass = data[k + 10]
+            b.inertia = data[k + 11]
+            b.invInertia = data[k + 12]
+            b.staticFriction = data[k + 13]
+            b.dynamicFriction = data[k + 14]
+            b.restitution = data[k + 15]
+            b.awake = data[k + 16] != 0.0
+            b.sleepTime = data[k + 17]
+            k += 18
+
+            shape = b.shape
+            if shape.typeId == CIRCLE:
+                shape.radius = data[k]
+                k += 1
+            elif shape.typeId == POLYGON:
+                # The geometry is never modified, only the reference is kept
+                k += 1 + 4 * int(data[k])
+                shape.SetGeometry(next(geometries))
+                shape.SetOrientation(b.orientation)
+
+        self.score = snapshot.score
+        self.rng.setstate(snapshot.rngState)
+        if self.contactCache is not None:
+            self.contactCache.impulses = snapshot.contactImpulses or {}
+        if snapshot.islands is not None:
+            for b, island in zip(self.bodies, snapshot.islands):
+                b.island = island
+
+    def settle(self, max_steps, tolerance=25.0, max_penetration=1.0, rest_steps=10):
+        """
+        Step until the bodies come to rest : kinetic energy per unit of mass
+        of every body at most tolerance and penetration at most
+        max_penetration during rest_steps steps in a row, or max_steps steps.
+
+        Return the number of steps, the score and a snapshot of the final
+        state.
+        """
+        steps = 0
+        rest = 0
+        measureEnergy = self.measureEnergy
+        self.measureEnergy = True
+        try:
+            while steps < max_steps:
+                self.step()
+                steps += 1
+
+                # Measured by FinishMotion while measureEnergy is set
+                if (
+                    self.maxSpecificEnergy <= tolerance
+                    and self.maxPenetration <= max_penetration
+                ):
+                    rest += 1
+                    if rest >= rest_steps:
+                        break
+                else:
+                    rest = 0
+        finally:
+            self.measureEnergy = measureEnergy
+
+        return steps, self.score, self.snapshot()
 
     def step(self):
-        # Generate new collision info
+        if self.stats is not None:
+            self.ProfiledStep()
+            return
+
+        contacts = self.FindContacts()
+        self.contacts = contacts
+        self.SolveContacts(contacts)
+        self.IntegrateVelocities()
+        self.CorrectPositions(contacts)
+        self.FinishMotion(contacts)
+        self.MergeFruits(contacts)
+
+    def ProfiledStep(self):
+        """
+        Same as step, recording the phase timings and counters in self.stats
+        """
+        clock = time.perf_counter
+        start = clock()
+        contacts = self.FindContacts()
+        self.contacts = contacts
+        t1 = clock()
+        self.SolveContacts(contacts)
+        t2 = clock()
+        self.IntegrateVelocities()
+        t3 = clock()
+        self.CorrectPositions(contacts)
+        t4 = clock()
+        self.FinishMotion(contacts)
+        t5 = clock()
+        self.MergeFruits(contacts)
+        t6 = clock()
+
+        integrated = 0
+        for b in self.bodies:
+            if b.invMass != 0.0 and b.awake:
+                integrated += 1
+
+        self.stats.Record(
+            {
+                "FindContacts": t1 - start,
+                "SolveContacts": t2 - t1,
+                "IntegrateVelocities": t3 - t2,
+                "CorrectPositions": t4 - t3,
+                "FinishMotion": t5 - t4,
+                "MergeFruits": t6 - t5,
+            },
+            {
+                "pairsTested": self.pairsTested,
+                "contacts": len(contacts),
+                "impulseIterations": self.iterations,
+                "bodiesIntegrated": integrated,
+            },
+        )
+
+    def FindContacts(self):
+        """
+        Generate new collision info
+        """
+        bodies = self.bodies
+        types = range(SHAPE_TYPE_COUNT)
+        batches = [[[] for _ in types] for _ in types]
+        asleep = []
+        tested = 0
+        for i, j in self.broadphase.GetPairs(bodies):
+            A = bodies[i]
+            B = bodies[j]
+            if A.invMass == 0 and B.invMass == 0:
+                continue
+
+            # Pairs without an awake dynamic body are not solved
+            if self.allowSleep and not self.IsActive(A) and not self.IsActive(B):
+                asleep.append((A, B))
+                continue
+
+            batches[A.shape.typeId][B.shape.typeId].append((A, B))
+            tested += 1
+
+        # Narrowphase, one batch per pair of shape types
         contacts = []
-        for i in range(0, len(self.bodies)):
-            A = self.bodies[i]
+        batchCount = 0
+        for typeA in range(SHAPE_TYPE_COUNT):
+            for typeB in range(SHAPE_TYPE_COUNT):
+                pairs = batches[typeA][typeB]
+                if pairs:
+                    batch_dispatch_table[typeA][typeB](pairs, contacts)
+                    batchCount += 1
 
-            for j in range(i + 1, len(self.bodies)):
-                B = self.bodies[j]
-                if A.invMass == 0 and B.invMass == 0:
-                    continue
+        # Solve the contacts in the order of the pairs whatever their shapes
+        if batchCount > 1:
+            index = {body: k for k, body in enumerate(bodies)}
+            contacts.sort(key=lambda m: (index[m.A], index[m.B]))
 
-                m = Manifold(A, B)
-                m.Solve()
-                if m.contact_count:
-                    contacts.append(m)
+        woken = False
+        if self.allowSleep:
+            for m in contacts:
+                woken |= self.WakeUp(m)
+
+        # Islands woken up by a contact bring back their own pairs
+        while woken:
+            woken = False
+            remaining = []
+            for A, B in asleep:
+                if self.IsActive(A) or self.IsActive(B):
+                    woken |= self.Collide(A, B, contacts)
+                    tested += 1
+                else:
+                    remaining.append((A, B))
+            asleep = remaining
+
+        # After the wake ups, so that the bodies woken this step rest on the
+        # walls too. A wall contact cannot wake anything up, walls are static.
+        if self.walls:
+            tested += self.CollideWalls(contacts)
 
+        self.pairsTested = tested
+        return contacts
+
+    def SolveContacts(self, contacts):
         # Integrate forces
         for i in range(0, len(self.bodies)):
             self.integrateForces(self.bodies[i], self.dt)
@@ -49,32 +397,228 @@ class World:
             contacts[i].Initialize(self.dt, self.gravity)
 
         # Solve collisions
-        for j in range(0, self.iterations):
-            for i in range(0, len(contacts)):
-                contacts[i].ApplyImpulse()
+        if self.contactCache is None:
+            for j in range(0, self.iterations):
+                for i in range(0, len(contacts)):
+                    contacts[i].ApplyImpulse()
+        else:
+            self.contactCache.WarmStart(contacts)
+            for j in range(0, self.iterations):
+                for i in range(0, len(contacts)):
+                    contacts[i].ApplyAccumulatedImpulse()
+            self.contactCache.Store(contacts)
+
+    def IntegrateVelocities(self):
+        for i in range(0, len(self.bodies)):
+            self.IntegrateVelocity(self.bodies[i], self.dt)
 
+    def CorrectPositions(self, contacts):
         # Correct positions
+        penetration = 0.0
         for i in range(0, len(contacts)):
             contacts[i].PositionalCorrection()
+            penetration = max(penetration, contacts[i].penetration)
+        self.maxPenetration = penetration
 
-        # Clear all forces
+    def FinishMotion(self, contacts):
+        """
+        Clear all forces, measure the kinetic energy on the way while
+        settling, and put the resting islands to sleep
+        """
+        measure = self.measureEnergy
+        energy = 0.0
+        maxSpecificEnergy = 0.0
         for i in range(0, len(self.bodies)):
             body = self.bodies[i]
             body.force.Set(0, 0)
             body.torque = 0
+            if measure and body.invMass != 0.0:
+                v = body.velocity
+                w = body.angularVelocity
+                e = (v.x * v.x + v.y * v.y + body.inertia * body.invMass * w * w) * 0.5
+                energy += body.mass * e
+                maxSpecificEnergy = max(maxSpecificEnergy, e)
+        if measure:
+            self.kineticEnergy = energy
+            self.maxSpecificEnergy = maxSpecificEnergy
+
+        if self.allowSleep:
+            self.UpdateSleep(contacts)
+
+    def CollideWalls(self, contacts) -> int:
+        """
+        Test the active bodies against each wall, O(n) per wall. Return the
+        number of manifolds computed.
+        """
+        tested = 0
+        for wall in self.walls:
+            n = wall.shape.normal
+            nx = n.x
+            ny = n.y
+            offset = wall.shape.Offset()
+            for b in self.bodies:
+                if b.invMass == 0.0 or not b.awake:
+                    continue
+
+                # Reject the bodies in front of the wall
+                shape = b.shape
+                if shape.typeId == CIRCLE:
+                    distance = nx * b.position.x + ny * b.position.y - offset
+                    if distance >= shape.radius:
+                        continue
+                else:
+                    # Corner of the AABB the furthest behind the wall
+                    box = shape.GetAABB()
+                    x = box[0] if nx > 0.0 else box[2]
+                    y = box[1] if ny > 0.0 else box[3]
+                    if nx * x + ny * y - offset >= 0.0:
+                        continue
+
+                m = Manifold(wall, b)
+                collision_dispatch_table[HALFPLANE][shape.typeId](m, wall, b)
+                tested += 1
+                if m.contact_count:
+                    contacts.append(m)
+        return tested
+
+    def MergeFruits(self, contacts):
+        """
+        Replace each pair of touching fruits of the same tier by one fruit of
+        the next tier, in the middle of the pair and with its momentum. A
+        fruit merges at most once per step, the largest ones never merge.
+        """
+        self.merges.clear()
+        lastTier = len(FRUITS) - 1
+        merged = None
+        for m in contacts:
+            A = m.A
+            B = m.B
+            tier = A.tier
+            if tier is None or tier != B.tier or tier == lastTier:
+                continue
+            if merged is None:
+                merged = set()
+            elif A in merged or B in merged:
+                continue
+            merged.add(A)
+            merged.add(B)
+
+            mass = A.mass + B.mass
+            vx = (A.velocity.x * A.mass + B.velocity.x * B.mass) / mass
+            vy = (A.velocity.y * A.mass + B.velocity.y * B.mass) / mass
+            x = (A.position.x + B.position.x) / 2.0
+            y = (A.position.y + B.position.y) / 2.0
+
+            self.remove(A)
+            self.remove(B)
+            fruit = self.add_fruit(tier + 1, x, y)
+            fruit.velocity.Set(vx, vy)
+            self.score += FRUITS[tier + 1].score
+            self.merges.append(fruit)
+
+    def Collide(self, A: Body, B: Body, contacts) -> bool:
+        """
+        Add the manifold of A and B to contacts if they touch, return True if
+        it woke up one of them
+        """
+        m = Manifold(A, B)
+        m.Solve()
+        if not m.contact_count:
+            return False
+
+        contacts.append(m)
+        return self.WakeUp(m)
+
+    @staticmethod
+    def WakeUp(m: Manifold) -> bool:
+        """
+        Wake up the bodies of a contact, return True if one was asleep
+        """
+        woken = False
+        for body in (m.A, m.B):
+            if not body.awake:
+                body.SetAwake(True)
+                woken = True
+        return woken
+
+    @staticmethod
+    def IsActive(b: Body) -> bool:
+        return b.awake and b.invMass != 0.0
+
+    def UpdateSleep(self, contacts) -> None:
+        """
+        Put to sleep the islands of bodies in contact that have all been
+        resting for timeToSleep
+        """
+        linearTolerance = Sqr(self.sleepLinearVelocity)
+        angularTolerance = Sqr(self.sleepAngularVelocity)
+        for b in self.bodies:
+            if not self.IsActive(b):
+                continue
+            if (
+                b.velocity.LenSqr() > linearTolerance
+                or Sqr(b.angularVelocity) > angularTolerance
+            ):
+                b.sleepTime = 0.0
+            else:
+                b.sleepTime += self.dt
+
+        # Static bodies do not link islands
+        neighbours = {}
+        for m in contacts:
+            if m.A.invMass != 0.0 and m.B.invMass != 0.0:
+                neighbours.setdefault(m.A, []).append(m.B)
+                neighbours.setdefault(m.B, []).append(m.A)
+
+        self.activeCount = 0
+        self.sleepingCount = 0
+        visited = set()
+        for body in self.bodies:
+            if body.invMass == 0.0:
+                continue
+            if not body.awake:
+                self.sleepingCount += 1
+                continue
+            if body in visited:
+                continue
+
+            # Depth first search of the island
+            island = [body]
+            visited.add(body)
+            stack = [body]
+            minSleepTime = body.sleepTime
+            while stack:
+                b = stack.pop()
+                minSleepTime = min(minSleepTime, b.sleepTime)
+                for n in neighbours.get(b, ()):
+                    if n not in visited:
+                        visited.add(n)
+                        island.append(n)
+                        stack.append(n)
+
+            if minSleepTime >= self.timeToSleep:
+                for b in island:
+                    b.SetAwake(False)
+                    b.island = island
+                self.sleepingCount += len(island)
+            else:
+                self.activeCount += len(island)
 
     def integrateForces(self, b: Body, dt: float) -> None:
-        if b.invMass == 0.0:
+        if b.invMass == 0.0 or not b.awake:
             return
 
-        b.velocity += (b.force * b.invMass + self.gravity) * (dt / 2.0)
+        h = dt / 2.0
+        v = b.velocity
+        v.x += (b.force.x * b.invMass + self.gravity.x) * h
+        v.y += (b.force.y * b.invMass + self.gravity.y) * h
         b.angularVelocity += b.torque * b.invInertia * (dt / 2.0)
 
     def IntegrateVelocity(self, b: Body, dt: float) -> None:
-        if b.invMass == 0.0:
+        if b.invMass == 0.0 or not b.awake:
             return
 
-        b.position += b.velocity * dt
+        b.position.AddScaled(b.velocity, dt)
         b.orientation += b.angularVelocity * dt
-        b.setOrient(b.orientation)
+        b.SetOrient(b.orientation)
         self.integrateForces(b, dt)
@@ -0,0 +1,48 @@
+import argparse
+import random
+from common.shape import Circle
+from game_engine.world import World
+from game_engine.headless import HeadlessRunner
+from game_engine.trajectory import TrajectoryRecorder
+from physic_engine.broadphase import SweepAndPrune
+
+WIDTH = 800
+HEIGHT = 600
+FPS = 60
+
+parser = argparse.ArgumentParser(description="Run the simulation without display")
+parser.add_argument("--steps", type=int, default=600)
+parser.add_argument("--bodies", type=int, default=50)
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--iterations", type=int, default=10)
+parser.add_argument("--warm-start", action="store_true")
+parser.add_argument("--sleep", action="store_true")
+parser.add_argument("--trajectory", help="record the bodies to a trajectory file")
+args = parser.parse_args()
+
+world = World(
+    1.0 / FPS,
+    args.iterations,
+    SweepAndPrune(),
+    args.warm_start,
+    args.sleep,
+    args.seed,
+)
+world.add_container(WIDTH, HEIGHT)
+rng = random.Random(args.seed)
+for i in range(args.bodies):
+    world.add(Circle(20), rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+
+recorder = None
+if args.trajectory is not None:
+    recorder = TrajectoryRecorder(world, args.trajectory)
+
+runner = HeadlessRunner(world)
+stepsPerSecond = runner.run(args.steps, recorder)
+if recorder is not None:
+    recorder.close()
+print("{} steps, {:.1f} steps/s".format(args.steps, stepsPerSecond))
+if world.contactCache is not None:
+    print("contact cache hit rate {:.1%}".format(world.contactCache.HitRate()))
+if world.allowSleep:
+    print("{} active, {} sleeping".format(world.activeCount, world.sleepingCount))
@@ -3,46 +3,41 @@ from common.math import *
 from common.shape import *
 from visualization.renderer import Renderer
 from game_engine.eventManager import EventManager
+from game_engine.physicsThread import PhysicsThread
 from game_engine.world import World
-from game_engine.clock import Clock
+from game_engine.stats import StepStats
+from physic_engine.broadphase import SweepAndPrune
 
 WIDTH = 800
 HEIGHT = 600
 FPS = 60
 
-accumulator = 0
 dt = 1.0 / FPS
-frameStepping = False
-canStep = False
 
-Clock = Clock()
-World = World(dt, 10)
+World = World(dt, 10, SweepAndPrune(), stats=StepStats())
 Renderer = Renderer(World, WIDTH, HEIGHT)
-EventManager = EventManager(World)
+World.add_container(WIDTH, HEIGHT)
 
 
 circle = Circle(20)
 World.add(circle, 400, 300)
 
+# The world is stepped on its own thread, the main loop only handles the
+# events and draws the latest state published by the physics thread
+Physics = PhysicsThread(World)
+EventManager = EventManager(World, Physics)
+FrameClock = pg.time.Clock()
+Physics.Start()
+
 # Main loop
 while EventManager.is_running():
-    accumulator += Clock.Elapsed()
-
-    Clock.Start()
-
-    accumulator = Clamp(0.0, 0.1, accumulator)
-    while accumulator >= dt:
-        if not frameStepping:
-            World.step()
-        else:
-            if canStep:
-                World.step()
-                canStep = False
-        accumulator -= dt
+    EventManager.process_events()
 
-    Clock.Stop()
+    state = Physics.Latest()
+    Renderer.render_state(state, Physics.Alpha(state))
 
-    EventManager.process_events()
-    Renderer.render_frame()
+    # Sleep between frames, the physics thread needs the interpreter too
+    FrameClock.tick(2 * FPS)
 
+Physics.Stop()
 pg.quit()
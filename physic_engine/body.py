@@ -1,9 +1,10 @@
 from common.shape import *
+import math
 import random
 
 
 class Body:
-    def __init__(self, shape, x, y):
+    def __init__(self, shape, x, y, orientation=None):
         self.shape = shape
 
         self.position = Vec2(x, y)
@@ -11,7 +12,9 @@ class Body:
 
         self.angularVelocity = 0.0
         self.torque = 0.0
-        self.orientation = math.radians(random.randint(0, 360))
+        if orientation is None:
+            orientation = math.radians(random.randint(0, 360))
+        self.orientation = orientation
 
         self.force = Vec2(0, 0)
 
@@ -24,15 +27,30 @@ class Body:
         self.dynamicFriction = 0.3
         self.restitution = 0.2
 
+        # Sleeping, see World.UpdateSleep
+        self.awake = True
+        self.sleepTime = 0.0
+        self.island = None  # Bodies put to sleep together
+
+        self.tier = None  # Fruit tier, see World.add_fruit
+        self.index = -1  # Position in World.bodies
+
         self.shape.body = self
         self.shape.ComputeMass(1.0)
+        self.shape.SetOrientation(self.orientation)
 
     def ApplyForce(self, force: Vec2) -> None:
-        self.force += force
+        if not self.awake:
+            self.SetAwake(True)
+        self.force.Add(force)
 
     def ApplyImpulse(self, impulse: Vec2, contactVector: Vec2) -> None:
-        self.velocity += impulse * self.invMass
-        self.angularVelocity += self.invInertia * Cross(contactVector, impulse)
+        if not self.awake:
+            self.SetAwake(True)
+        self.velocity.AddScaled(impulse, self.invMass)
+        self.angularVelocity += self.invInertia * (
+            contactVector.x * impulse.y - contactVector.y * impulse.x
+        )
 
     def SetStatic(self) -> None:
         self.inertia = 0.0
@@ -43,3 +61,20 @@ class Body:
     def SetOrient(self, radians: float) -> None:
         self.orientation = radians
         self.shape.SetOrientation(radians)
+
+    def SetAwake(self, awake: bool) -> None:
+        """
+        Waking up a body wakes up the whole island it fell asleep with
+        """
+        if awake:
+            island = self.island if self.island is not None else [self]
+            for body in island:
+                body.awake = True
+                body.sleepTime = 0.0
+                body.island = None
+        else:
+            self.awake = False
+            self.velocity.Set(0, 0)
+            self.angularVelocity = 0.0
+            self.force.Set(0, 0)
+            self.torque = 0.0
@@ -0,0 +1,108 @@
+from math import floor
+
+
+def AABBOverlap(a, b) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class BroadPhase:
+    """
+    Find the pairs of bodies that may be colliding.
+
+    GetPairs returns index pairs (i, j) with i < j, sorted the same way as the
+    brute force double loop so that the contacts are solved in the same order
+    whatever the broadphase.
+    """
+
+    def GetPairs(self, bodies):
+        pass
+
+
+class BruteForce(BroadPhase):
+    """
+    Every pair of bodies, O(n²)
+    """
+
+    def GetPairs(self, bodies):
+        n = len(bodies)
+        return [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+
+class SweepAndPrune(BroadPhase):
+    """
+    Sort the AABBs along the x axis and only test the ones overlapping on it
+    """
+
+    def GetPairs(self, bodies):
+        boxes = [body.shape.GetAABB() for body in bodies]
+        order = sorted(range(len(boxes)), key=lambda i: boxes[i][0])
+
+        pairs = []
+        active = []
+        for i in order:
+            box = boxes[i]
+            minX = box[0]
+
+            # Drop the boxes ending before this one starts
+            active = [k for k in active if boxes[k][2] >= minX]
+
+            for k in active:
+                other = boxes[k]
+                if box[1] <= other[3] and other[1] <= box[3]:
+                    pairs.append((i, k) if i < k else (k, i))
+
+            active.append(i)
+
+        pairs.sort()
+        return pairs
+
+
+class SpatialHash(BroadPhase):
+    """
+    Uniform grid, each body is inserted in all the cells its AABB covers.
+
+    cellSize : size of a cell, if None it is computed at each call from the
+    largest AABB so that a body covers at most 4 cells
+    """
+
+    def __init__(self, cellSize=None):
+        self.cellSize = cellSize
+
+    def GetPairs(self, bodies):
+        boxes = [body.shape.GetAABB() for body in bodies]
+
+        cellSize = self.cellSize
+        if cellSize is None:
+            cellSize = 1.0
+            for box in boxes:
+                cellSize = max(cellSize, box[2] - box[0], box[3] - box[1])
+        invCellSize = 1.0 / cellSize
+
+        grid = {}
+        for i, box in enumerate(boxes):
+            x0 = floor(box[0] * invCellSize)
+            x1 = floor(box[2] * invCellSize)
+            y0 = floor(box[1] * invCellSize)
+            y1 = floor(box[3] * invCellSize)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    cell = grid.get((x, y))
+                    if cell is None:
+                        grid[(x, y)] = [i]
+                    else:
+                        cell.append(i)
+
+        candidates = set()
+        for cell in grid.values():
+            count = len(cell)
+            for a in range(count):
+                i = cell[a]
+                for b in range(a + 1, count):
+                    candidates.add((i, cell[b]))
+
+        # Indices in a cell are increasing so the pairs already have i < j
+        pairs = [
+            pair for pair in candidates if AABBOverlap(boxes[pair[0]], boxes[pair[1]])
+        ]
+        pairs.sort()
+        return pairs
@@ -1,6 +1,6 @@
 from physic_engine.body import Body
 from common.shape import Circle, Polygon
-from common.math import Vec2
+from common.math import *
 from math import sqrt
 
 
@@ -26,7 +26,7 @@ def CircletoCircle(m, a: Body, b: Body):
     if distance == 0.0:
         m.penetration = A.radius
         m.normal = Vec2(1, 0)
-        m.contacts[0] = a.position
+        m.contacts[0] = Vec2(a.position.x, a.position.y)
     else:
         m.penetration = radius - distance
         m.normal = normal / distance
@@ -39,16 +39,22 @@ def CircletoPolygon(m, a: Body, b: Body):
 
     m.contact_count = 0
 
-    # Transform circle center to Polygon model space
+    # Work in world space with the cached polygon geometry
+    B.UpdateWorldGeometry()
+    vertices = B.worldVertices
+    normals = B.worldNormals
+    count = B.m_vertexCount
     center = a.position
-    center = B.u.Transpose() * (center - b.position)
+    cx = center.x
+    cy = center.y
 
     # Find edge with minimum penetration
     # Exact concept as using support points in Polygon vs Polygon
     separation = -float("inf")
     faceNormal = 0
-    for i in range(B.m_vertexCount):
-        s = Dot(B.m_normals[i], center - B.m_vertices[i])
+    for i in range(count):
+        k = 2 * i
+        s = normals[k] * (cx - vertices[k]) + normals[k + 1] * (cy - vertices[k + 1])
 
         if s > A.radius:
             return
@@ -56,16 +62,20 @@ def CircletoPolygon(m, a: Body, b: Body):
             separation = s
             faceNormal = i
 
+    m.features[0] = faceNormal
+
     # Grab face's vertices
-    v1 = B.m_vertices[faceNormal]
-    i2 = faceNormal + 1 if faceNormal + 1 < B.m_vertexCount else 0
-    v2 = B.m_vertices[i2]
+    k = 2 * faceNormal
+    v1 = Vec2(vertices[k], vertices[k + 1])
+    k2 = k + 2 if faceNormal + 1 < count else 0
+    v2 = Vec2(vertices[k2], vertices[k2 + 1])
+    n = Vec2(normals[k], normals[k + 1])
 
     # Check to see if center is within polygon
     if separation < EPSILON:
         m.contact_count = 1
-        m.normal = -(B.u * B.m_normals[faceNormal])
-        m.contacts[0] = m.normal * A.radius + a.position
+        m.normal = -n
+        m.contacts[0] = m.normal * A.radius + center
         m.penetration = A.radius
         return
 
@@ -80,10 +90,8 @@ def CircletoPolygon(m, a: Body, b: Body):
             return
         m.contact_count = 1
         n = v1 - center
-        n = B.u * n
-        n.Normalize()
+        n.normalize()
         m.normal = n
-        v1 = B.u * v1 + b.position
         m.contacts[0] = v1
 
     # Closest to v2
@@ -93,21 +101,17 @@ def CircletoPolygon(m, a: Body, b: Body):
 
         m.contact_count = 1
         n = v2 - center
-        v2 = B.u * v2 + b.position
-        m.contacts[0] = v2
-        n = B.u * n
-        n.Normalize()
+        n.normalize()
         m.normal = n
+        m.contacts[0] = v2
 
     # Closest to face
     else:
-        n = B.m_normals[faceNormal]
         if Dot(center - v1, n) > A.radius:
             return
 
-        n = B.u * n
         m.normal = -n
-        m.contacts[0] = m.normal * A.radius + a.position
+        m.contacts[0] = m.normal * A.radius + center
         m.contact_count = 1
 
 
@@ -117,66 +121,72 @@ def PolygontoCircle(m, a: Body, b: Body):
 
 
 def FindAxisLeastPenetration(faceIndex, A: Polygon, B: Polygon):
+    """
+    Both polygons must have their world geometry up to date
+    """
     bestDistance = -float("inf")
     bestIndex = 0
 
-    for i in range(A.m_vertexCount):
+    verticesA = A.worldVertices
+    normalsA = A.worldNormals
+    verticesB = B.worldVertices
+    sizeB = len(verticesB)
+    for i in range(0, len(verticesA), 2):
         # Retrieve a face normal from A
-        n = A.m_normals[i]
-        nw = A.u * n
-
-        # Transform face normal into B's model space
-        buT = B.u.Transpose()
-        n = buT * nw
+        nx = normalsA[i]
+        ny = normalsA[i + 1]
 
         # Retrieve support point from B along -n
-        s = B.GetSupport(-n)
-
-        # Retrieve vertex on face from A, transform into
-        # B's model space
-        v = A.m_vertices[i]
-        v = A.u * v + A.body.position
-        v -= B.body.position
-        v = buT * v
-
-        # Compute penetration distance (in B's model space)
-        d = Dot(n, s - v)
+        sx = verticesB[0]
+        sy = verticesB[1]
+        bestProjection = -(nx * sx + ny * sy)
+        for k in range(2, sizeB, 2):
+            wx = verticesB[k]
+            wy = verticesB[k + 1]
+            projection = -(nx * wx + ny * wy)
+            if projection > bestProjection:
+                sx = wx
+                sy = wy
+                bestProjection = projection
+
+        # Compute penetration distance to the vertex on face from A
+        d = nx * (sx - verticesA[i]) + ny * (sy - verticesA[i + 1])
 
         # Store greatest distance
         if d > bestDistance:
             bestDistance = d
-            bestIndex = i
+            bestIndex = i // 2
 
     faceIndex[0] = bestIndex
     return bestDistance
 
 
 def FindIncidentFace(v: Vec2, RefPoly: Polygon, IncPoly: Polygon, referenceIndex: int):
-    referenceNormal = RefPoly.m_normals[referenceIndex]
-
-    # Calculate normal in incident's frame of reference
-    referenceNormal = RefPoly.u * referenceNormal  # To world space
-    referenceNormal = (
-        IncPoly.u.Transpose() * referenceNormal
-    )  # To incident's model space
+    rx = RefPoly.worldNormals[2 * referenceIndex]
+    ry = RefPoly.worldNormals[2 * referenceIndex + 1]
 
     # Find most anti-normal face on incident polygon
+    normals = IncPoly.worldNormals
     incidentFace = 0
     minDot = float("inf")
     for i in range(IncPoly.m_vertexCount):
-        dot = Dot(referenceNormal, IncPoly.m_normals[i])
+        dot = rx * normals[2 * i] + ry * normals[2 * i + 1]
         if dot < minDot:
             minDot = dot
             incidentFace = i
 
-    v[0] = IncPoly.u * IncPoly.m_vertices[incidentFace] + IncPoly.body.position
+    vertices = IncPoly.worldVertices
+    v[0] = Vec2(vertices[2 * incidentFace], vertices[2 * incidentFace + 1])
+    first = incidentFace
     incidentFace = incidentFace + 1 if incidentFace + 1 < IncPoly.m_vertexCount else 0
-    v[1] = IncPoly.u * IncPoly.m_vertices[incidentFace] + IncPoly.body.position
+    v[1] = Vec2(vertices[2 * incidentFace], vertices[2 * incidentFace + 1])
+
+    return first
 
 
 def Clip(n: Vec2, c: float, face):
     sp = 0
-    out = [Vec2(face[0]), Vec2(face[1])]
+    out = [face[0], face[1]]
 
     # Retrieve distances from each endpoint to the line
     # d = ax + by - c
@@ -212,6 +222,8 @@ def PolygontoPolygon(m, a: Body, b: Body):
     B = b.shape  # Polygon B
 
     m.contact_count = 0
+    A.UpdateWorldGeometry()
+    B.UpdateWorldGeometry()
 
     # Check for a separating axis with A's face planes
     faceA = [0]
@@ -244,23 +256,23 @@ def PolygontoPolygon(m, a: Body, b: Body):
         flip = True
 
     # World space incident face
-    incidentFace = [Vec2(0), Vec2(0)]
-    FindIncidentFace(incidentFace, RefPoly, IncPoly, referenceIndex)
+    incidentFace = [Vec2(0, 0), Vec2(0, 0)]
+    incidentIndex = FindIncidentFace(incidentFace, RefPoly, IncPoly, referenceIndex)
+
+    # Contact features : reference face, incident face and clipped point
+    feature = (flip, referenceIndex, incidentIndex)
 
-    # Setup reference face vertices
-    v1 = RefPoly.m_vertices[referenceIndex]
+    # Setup reference face vertices, in world space
+    vertices = RefPoly.worldVertices
+    v1 = Vec2(vertices[2 * referenceIndex], vertices[2 * referenceIndex + 1])
     referenceIndex = (
         referenceIndex + 1 if referenceIndex + 1 != RefPoly.m_vertexCount else 0
     )
-    v2 = RefPoly.m_vertices[referenceIndex]
-
-    # Transform vertices to world space
-    v1 = RefPoly.u * v1 + RefPoly.body.position
-    v2 = RefPoly.u * v2 + RefPoly.body.position
+    v2 = Vec2(vertices[2 * referenceIndex], vertices[2 * referenceIndex + 1])
 
     # Calculate reference face side normal in world space
     sidePlaneNormal = v2 - v1
-    sidePlaneNormal.Normalize()
+    sidePlaneNormal.normalize()
 
     # Orthogonalize
     refFaceNormal = Vec2(sidePlaneNormal.y, -sidePlaneNormal.x)
@@ -284,6 +296,7 @@ def PolygontoPolygon(m, a: Body, b: Body):
     separation = Dot(refFaceNormal, incidentFace[0]) - refC
     if separation <= 0.0:
         m.contacts[cp] = incidentFace[0]
+        m.features[cp] = feature + (0,)
         m.penetration = -separation
         cp += 1
     else:
@@ -292,6 +305,7 @@ def PolygontoPolygon(m, a: Body, b: Body):
     separation = Dot(refFaceNormal, incidentFace[1]) - refC
     if separation <= 0.0:
         m.contacts[cp] = incidentFace[1]
+        m.features[cp] = feature + (1,)
 
         m.penetration += -separation
         cp += 1
@@ -302,9 +316,83 @@ def PolygontoPolygon(m, a: Body, b: Body):
     m.contact_count = cp
 
 
-collision_dispatch_table = {
-    ("Circle", "Circle"): CircletoCircle,
-    ("Circle", "Polygon"): CircletoPolygon,
-    ("Polygon", "Circle"): PolygontoCircle,
-    ("Polygon", "Polygon"): PolygontoPolygon,
-}
+def HalfPlanetoCircle(m, a: Body, b: Body):
+    A = a.shape  # HalfPlane
+    B = b.shape  # Circle
+
+    m.contact_count = 0
+
+    n = A.normal
+    distance = Dot(n, b.position) - A.Offset()
+    if distance >= B.radius:
+        return
+
+    m.contact_count = 1
+    m.normal = Vec2(n.x, n.y)
+    m.penetration = B.radius - distance
+    m.contacts[0] = b.position - n * B.radius
+    m.features[0] = 0
+
+
+def CircletoHalfPlane(m, a: Body, b: Body):
+    HalfPlanetoCircle(m, b, a)
+    m.normal = -m.normal
+
+
+def HalfPlanetoPolygon(m, a: Body, b: Body):
+    A = a.shape  # HalfPlane
+    B = b.shape  # Polygon
+
+    m.contact_count = 0
+
+    B.UpdateWorldGeometry()
+    vertices = B.worldVertices
+    nx = A.normal.x
+    ny = A.normal.y
+    offset = A.Offset()
+
+    # The two vertices furthest behind the boundary
+    first = second = -1
+    d1 = d2 = 0.0
+    for i in range(0, len(vertices), 2):
+        d = nx * vertices[i] + ny * vertices[i + 1] - offset
+        if d < d1:
+            second = first
+            d2 = d1
+            first = i
+            d1 = d
+        elif d < d2:
+            second = i
+            d2 = d
+
+    if first < 0:
+        return
+
+    m.normal = Vec2(nx, ny)
+    m.contacts[0] = Vec2(vertices[first], vertices[first + 1])
+    m.features[0] = first // 2
+    m.penetration = -d1
+    m.contact_count = 1
+
+    if second >= 0:
+        m.contacts[1] = Vec2(vertices[second], vertices[second + 1])
+        m.features[1] = second // 2
+        m.penetration = -(d1 + d2) / 2
+        m.contact_count = 2
+
+
+def PolygontoHalfPlane(m, a: Body, b: Body):
+    HalfPlanetoPolygon(m, b, a)
+    m.normal = -m.normal
+
+
+def HalfPlanetoHalfPlane(m, a: Body, b: Body):
+    m.contact_count = 0
+
+
+# Indexed by the shape type ids : collision_dispatch_table[A.typeId][B.typeId]
+collision_dispatch_table = [
+    [CircletoCircle, CircletoPolygon, CircletoHalfPlane],
+    [PolygontoCircle, PolygontoPolygon, PolygontoHalfPlane],
+    [HalfPlanetoCircle, HalfPlanetoPolygon, HalfPlanetoHalfPlane],
+]
@@ -0,0 +1,40 @@
+class ContactCache:
+    """
+    Keep the impulses accumulated by the manifolds of one step, keyed by body
+    pair and contact feature, to warm start the manifolds of the next step
+    """
+
+    def __init__(self):
+        self.impulses = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def WarmStart(self, contacts):
+        """
+        Restore the impulses of the persisting contacts and apply them
+        """
+        impulses = self.impulses
+        for m in contacts:
+            for i in range(m.contact_count):
+                self.lookups += 1
+                cached = impulses.get((m.A, m.B, m.features[i]))
+                if cached is not None:
+                    self.hits += 1
+                    m.normalImpulse[i], m.tangentImpulse[i] = cached
+            m.WarmStart()
+
+    def Store(self, contacts):
+        """
+        Replace the cache with the impulses of this step's contacts
+        """
+        impulses = {}
+        for m in contacts:
+            for i in range(m.contact_count):
+                impulses[(m.A, m.B, m.features[i])] = (
+                    m.normalImpulse[i],
+                    m.tangentImpulse[i],
+                )
+        self.impulses = impulses
+
+    def HitRate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
@@ -1,7 +1,7 @@
 from common.math import *
 from physic_engine.body import Body
 from common.shape import Shape
-from physic_engine.collision import collision_dispatch_table
+from physic_engine.collision import *
 from math import sqrt
 
 
@@ -14,70 +14,132 @@ class Manifold:
         self.normal = Vec2(0, 0)  # From A to B
         self.contacts = [None, None]  # Points of contact during collision
         self.contact_count = 0  # Number of contacts that occured during collision
+        self.features = [0, 0]  # Identify the contacts from one step to the next
+        self.normalImpulse = [0.0, 0.0]  # Accumulated impulses, see ContactCache
+        self.tangentImpulse = [0.0, 0.0]
+        self.bias = [0.0, 0.0]  # Target normal velocity from restitution
         self.e = 0  # Mixed restitution
         self.df = 0  # Mixed dynamic friction
         self.sf = 0  # Mixed static friction
 
     def Solve(self):
-        collision_dispatch_table.get((self.A.shape.GetType(), self.B.shape.GetType()))(
+        collision_dispatch_table[self.A.shape.typeId][self.B.shape.typeId](
             self, self.A, self.B
         )
 
+    # The solver works on the vector components, so that solving a contact
+    # does not create any Vec2
+
     def Initialize(self, dt, gravity):
+        A = self.A
+        B = self.B
+
         # Calculate average restitution
-        self.e = min(self.A.restitution, self.B.restitution)
+        self.e = min(A.restitution, B.restitution)
 
         # Calculate static and dynamic friction
-        self.sf = sqrt(self.A.staticFriction * self.B.staticFriction)
-        self.df = sqrt(self.A.dynamicFriction * self.B.dynamicFriction)
+        self.sf = sqrt(A.staticFriction * B.staticFriction)
+        self.df = sqrt(A.dynamicFriction * B.dynamicFriction)
 
+        restingSpeedSqr = (gravity.x * dt) ** 2 + (gravity.y * dt) ** 2 + EPSILON
+        wA = A.angularVelocity
+        wB = B.angularVelocity
         for i in range(self.contact_count):
-            ra = self.contacts[i] - self.A.position
-            rb = self.contacts[i] - self.B.position
-
-            rv = (
-                self.B.velocity
-                + Cross(self.B.angularVelocity, rb)
-                - self.A.velocity
-                - Cross(self.A.angularVelocity, ra)
-            )
+            c = self.contacts[i]
+            rax = c.x - A.position.x
+            ray = c.y - A.position.y
+            rbx = c.x - B.position.x
+            rby = c.y - B.position.y
 
-            if rv.LenSqr() < (gravity * dt).LenSqr() + EPSILON:
+            rvx = B.velocity.x + -wB * rby - A.velocity.x - -wA * ray
+            rvy = B.velocity.y + wB * rbx - A.velocity.y - wA * rax
+
+            if rvx**2 + rvy**2 < restingSpeedSqr:
                 self.e = 0.0
 
+        nx = self.normal.x
+        ny = self.normal.y
+        for i in range(self.contact_count):
+            c = self.contacts[i]
+            rax = c.x - A.position.x
+            ray = c.y - A.position.y
+            rbx = c.x - B.position.x
+            rby = c.y - B.position.y
+
+            rvx = B.velocity.x + -wB * rby - A.velocity.x - -wA * ray
+            rvy = B.velocity.y + wB * rbx - A.velocity.y - wA * rax
+            self.bias[i] = -self.e * min(rvx * nx + rvy * ny, 0.0)
+
+    def WarmStart(self):
+        """
+        Apply the impulses accumulated during the previous step
+        """
+        A = self.A
+        B = self.B
+        vA = A.velocity
+        vB = B.velocity
+        nx = self.normal.x
+        ny = self.normal.y
+        tx = ny  # Cross(normal, 1.0)
+        ty = -nx
+        for i in range(self.contact_count):
+            c = self.contacts[i]
+            rax = c.x - A.position.x
+            ray = c.y - A.position.y
+            rbx = c.x - B.position.x
+            rby = c.y - B.position.y
+
+            px = nx * self.normalImpulse[i] + tx * self.tangentImpulse[i]
+            py = ny * self.normalImpulse[i] + ty * self.tangentImpulse[i]
+
+            vA.x += -px * A.invMass
+            vA.y += -py * A.invMass
+            A.angularVelocity += A.invInertia * (rax * -py - ray * -px)
+            vB.x += px * B.invMass
+            vB.y += py * B.invMass
+            B.angularVelocity += B.invInertia * (rbx * py - rby * px)
+
     def ApplyImpulse(self):
+        A = self.A
+        B = self.B
+
         # Early out and positional correct if both objects have infinite mass
-        if Equal(self.A.invMass + self.B.invMass, 0):
+        if Equal(A.invMass + B.invMass, 0):
             self.InfiniteMassCorrection()
             return
 
+        vA = A.velocity
+        vB = B.velocity
+        nx = self.normal.x
+        ny = self.normal.y
         for i in range(self.contact_count):
             # Calculate radii from COM to contact
-            ra = self.contacts[i] - self.A.position
-            rb = self.contacts[i] - self.B.position
+            c = self.contacts[i]
+            rax = c.x - A.position.x
+            ray = c.y - A.position.y
+            rbx = c.x - B.position.x
+            rby = c.y - B.position.y
 
             # Relative velocity
-            rv = (
-                self.B.velocity
-                + Cross(self.B.angularVelocity, rb)
-                - self.A.velocity
-                - Cross(self.A.angularVelocity, ra)
-            )
+            wA = A.angularVelocity
+            wB = B.angularVelocity
+            rvx = vB.x + -wB * rby - vA.x - -wA * ray
+            rvy = vB.y + wB * rbx - vA.y - wA * rax
 
             # Relative velocity along the normal
-            contactVel = Dot(rv, self.normal)
+            contactVel = rvx * nx + rvy * ny
 
             # Do not resolve if velocities are separating
             if contactVel > 0:
                 return
 
-            raCrossN = Cross(ra, self.normal)
-            rbCrossN = Cross(rb, self.normal)
+            raCrossN = rax * ny - ray * nx
+            rbCrossN = rbx * ny - rby * nx
             invMassSum = (
-                self.A.invMass
-                + self.B.invMass
-                + Sqr(raCrossN) * self.A.invInertia
-                + Sqr(rbCrossN) * self.B.invInertia
+                A.invMass
+                + B.invMass
+                + raCrossN * raCrossN * A.invInertia
+                + rbCrossN * rbCrossN * B.invInertia
             )
 
             # Calculate impulse scalar
@@ -86,52 +148,202 @@ class Manifold:
             j /= self.contact_count
 
             # Apply impulse
-            impulse = self.normal * j
-            self.A.ApplyImpulse(-impulse, ra)
-            self.B.ApplyImpulse(impulse, rb)
+            px = nx * j
+            py = ny * j
+            vA.x += -px * A.invMass
+            vA.y += -py * A.invMass
+            A.angularVelocity += A.invInertia * (rax * -py - ray * -px)
+            vB.x += px * B.invMass
+            vB.y += py * B.invMass
+            B.angularVelocity += B.invInertia * (rbx * py - rby * px)
 
             # Friction impulse
-            rv = (
-                self.B.velocity
-                + Cross(self.B.angularVelocity, rb)
-                - self.A.velocity
-                - Cross(self.A.angularVelocity, ra)
-            )
+            wA = A.angularVelocity
+            wB = B.angularVelocity
+            rvx = vB.x + -wB * rby - vA.x - -wA * ray
+            rvy = vB.y + wB * rbx - vA.y - wA * rax
 
-            t = rv - (self.normal * Dot(rv, self.normal))
-            t.normalize()
+            d = rvx * nx + rvy * ny
+            tx = rvx - nx * d
+            ty = rvy - ny * d
+            length = sqrt(tx**2 + ty**2)
+            if length > EPSILON:
+                invLength = 1 / length
+                tx *= invLength
+                ty *= invLength
 
             # j tangent magnitude
-            jt = -Dot(rv, t)
+            jt = -(rvx * tx + rvy * ty)
             jt /= invMassSum
             jt /= self.contact_count
 
             # Don't apply tiny friction impulses
-            if Equal(jt, 0.0):
+            if abs(jt) < EPSILON:
                 return
 
             # Coulumb's law
             if abs(jt) < j * self.sf:
-                tangentImpulse = t * jt
+                px = tx * jt
+                py = ty * jt
             else:
-                tangentImpulse = t * -j * self.df
+                px = tx * -j * self.df
+                py = ty * -j * self.df
 
             # Apply friction impulse
-            self.A.ApplyImpulse(-tangentImpulse, ra)
-            self.B.ApplyImpulse(tangentImpulse, rb)
+            vA.x += -px * A.invMass
+            vA.y += -py * A.invMass
+            A.angularVelocity += A.invInertia * (rax * -py - ray * -px)
+            vB.x += px * B.invMass
+            vB.y += py * B.invMass
+            B.angularVelocity += B.invInertia * (rbx * py - rby * px)
+
+    def ApplyAccumulatedImpulse(self):
+        """
+        Same as ApplyImpulse but the impulses are accumulated over the
+        iterations and clamped, so that they can be reused by WarmStart
+        """
+        A = self.A
+        B = self.B
+        if Equal(A.invMass + B.invMass, 0):
+            self.InfiniteMassCorrection()
+            return
+
+        vA = A.velocity
+        vB = B.velocity
+        nx = self.normal.x
+        ny = self.normal.y
+        tx = ny  # Cross(normal, 1.0)
+        ty = -nx
+        for i in range(self.contact_count):
+            c = self.contacts[i]
+            rax = c.x - A.position.x
+            ray = c.y - A.position.y
+            rbx = c.x - B.position.x
+            rby = c.y - B.position.y
+
+            wA = A.angularVelocity
+            wB = B.angularVelocity
+            rvx = vB.x + -wB * rby - vA.x - -wA * ray
+            rvy = vB.y + wB * rbx - vA.y - wA * rax
+
+            raCrossN = rax * ny - ray * nx
+            rbCrossN = rbx * ny - rby * nx
+            invMassSum = (
+                A.invMass
+                + B.invMass
+                + raCrossN * raCrossN * A.invInertia
+                + rbCrossN * rbCrossN * B.invInertia
+            )
+
+            # Normal impulse, the accumulated one can only push
+            j = (self.bias[i] - (rvx * nx + rvy * ny)) / invMassSum
+            old = self.normalImpulse[i]
+            self.normalImpulse[i] = max(old + j, 0.0)
+            j = self.normalImpulse[i] - old
+            px = nx * j
+            py = ny * j
+            vA.x += -px * A.invMass
+            vA.y += -py * A.invMass
+            A.angularVelocity += A.invInertia * (rax * -py - ray * -px)
+            vB.x += px * B.invMass
+            vB.y += py * B.invMass
+            B.angularVelocity += B.invInertia * (rbx * py - rby * px)
+
+            # Friction impulse
+            wA = A.angularVelocity
+            wB = B.angularVelocity
+            rvx = vB.x + -wB * rby - vA.x - -wA * ray
+            rvy = vB.y + wB * rbx - vA.y - wA * rax
+
+            raCrossT = rax * ty - ray * tx
+            rbCrossT = rbx * ty - rby * tx
+            invMassSumT = (
+                A.invMass
+                + B.invMass
+                + raCrossT * raCrossT * A.invInertia
+                + rbCrossT * rbCrossT * B.invInertia
+            )
+            jt = -(rvx * tx + rvy * ty) / invMassSumT
+
+            # Coulumb's law
+            old = self.tangentImpulse[i]
+            jt += old
+            if abs(jt) > self.normalImpulse[i] * self.sf:
+                maxFriction = self.normalImpulse[i] * self.df
+                jt = Clamp(-maxFriction, maxFriction, jt)
+            self.tangentImpulse[i] = jt
+
+            jt -= old
+            px = tx * jt
+            py = ty * jt
+            vA.x += -px * A.invMass
+            vA.y += -py * A.invMass
+            A.angularVelocity += A.invInertia * (rax * -py - ray * -px)
+            vB.x += px * B.invMass
+            vB.y += py * B.invMass
+            B.angularVelocity += B.invInertia * (rbx * py - rby * px)
 
     def PositionalCorrection(self):
         k_slop = 0.05
         percent = 0.4
-        correction = (
-            max(self.penetration - k_slop, 0.0)
-            / (self.A.invMass + self.B.invMass)
-            * self.normal
-            * percent
-        )
-        self.A.position -= correction * self.A.invMass
-        self.B.position += correction * self.B.invMass
+        A = self.A
+        B = self.B
+        s = max(self.penetration - k_slop, 0.0) / (A.invMass + B.invMass)
+        cx = self.normal.x * s * percent
+        cy = self.normal.y * s * percent
+        A.position.x -= cx * A.invMass
+        A.position.y -= cy * A.invMass
+        B.position.x += cx * B.invMass
+        B.position.y += cy * B.invMass
 
     def InfiniteMassCorrection(self):
         self.A.velocity.Set(0, 0)
         self.B.velocity.Set(0, 0)
+
+
+# Batched narrowphase : each function takes a list of (A, B) pairs of the same
+# shape types and appends the manifolds of the touching ones to contacts, so
+# that the dispatch is done once per batch instead of once per pair
+
+
+def CircletoCircleBatch(pairs, contacts):
+    for A, B in pairs:
+        # Reject the separated pairs before creating a Manifold
+        dx = B.position.x - A.position.x
+        dy = B.position.y - A.position.y
+        radius = A.shape.radius + B.shape.radius
+        if dx**2 + dy**2 >= radius * radius:
+            continue
+
+        m = Manifold(A, B)
+        CircletoCircle(m, A, B)
+        contacts.append(m)
+
+
+def _Batch(narrowphase):
+    def Batch(pairs, contacts):
+        for A, B in pairs:
+            m = Manifold(A, B)
+            narrowphase(m, A, B)
+            if m.contact_count:
+                contacts.append(m)
+
+    Batch.__name__ = narrowphase.__name__ + "Batch"
+    return Batch
+
+
+CircletoPolygonBatch = _Batch(CircletoPolygon)
+PolygontoCircleBatch = _Batch(PolygontoCircle)
+PolygontoPolygonBatch = _Batch(PolygontoPolygon)
+CircletoHalfPlaneBatch = _Batch(CircletoHalfPlane)
+PolygontoHalfPlaneBatch = _Batch(PolygontoHalfPlane)
+HalfPlanetoCircleBatch = _Batch(HalfPlanetoCircle)
+HalfPlanetoPolygonBatch = _Batch(HalfPlanetoPolygon)
+HalfPlanetoHalfPlaneBatch = _Batch(HalfPlanetoHalfPlane)
+
+# Indexed by the shape type ids, like collision_dispatch_table
+batch_dispatch_table = [
+    [CircletoCircleBatch, CircletoPolygonBatch, CircletoHalfPlaneBatch],
+    [PolygontoCircleBatch, PolygontoPolygonBatch, PolygontoHalfPlaneBatch],
+    [HalfPlanetoCircleBatch, HalfPlanetoPolygonBatch, HalfPlanetoHalfPlaneBatch],
+]
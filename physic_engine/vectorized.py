@@ -0,0 +1,344 @@
+import numpy as np
+from common.math import EPSILON
+
+
+class BodyArrays:
+    """
+    Structure of arrays holding the state of circle bodies
+    """
+
+    fields = (
+        "position",
+        "velocity",
+        "force",
+        "orientation",
+        "angularVelocity",
+        "torque",
+        "mass",
+        "invMass",
+        "inertia",
+        "invInertia",
+        "radius",
+        "staticFriction",
+        "dynamicFriction",
+        "restitution",
+    )
+    vectorFields = ("position", "velocity", "force")
+
+    def __init__(self, capacity=0):
+        for name in self.fields:
+            shape = (capacity, 2) if name in self.vectorFields else (capacity,)
+            setattr(self, name, np.zeros(shape))
+
+    def Grow(self, capacity):
+        for name in self.fields:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def Slice(self, count, start=0):
+        """
+        Views on count bodies from start
+        """
+        view = BodyArrays.__new__(BodyArrays)
+        for name in self.fields:
+            setattr(view, name, getattr(self, name)[start : start + count])
+        return view
+
+
+def CrossSV(a, v):
+    """
+    Cross product of scalars and vectors
+    """
+    return np.stack((-a * v[:, 1], a * v[:, 0]), axis=1)
+
+
+def CrossVV(a, b):
+    """
+    Cross product of vectors
+    """
+    return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+
+def DotVV(a, b):
+    return a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1]
+
+
+def CircleContacts(position, radius, invMass, group=None):
+    """
+    Find all the overlapping pairs of circles with a sweep along the x axis.
+
+    group : optional id per body, only bodies of the same group can collide
+
+    Return the (A, B) index arrays with A < B, sorted like the brute force
+    double loop. Pairs of static bodies are skipped.
+    """
+    count = len(radius)
+    if count < 2:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    minX = position[:, 0] - radius
+    maxX = position[:, 0] + radius
+    if group is not None:
+        # Move each group away from the others on the x axis
+        span = maxX.max() - minX.min() + 1.0
+        minX = minX + group * span
+        maxX = maxX + group * span
+
+    order = np.argsort(minX, kind="stable")
+    sortedMin = minX[order]
+    sortedMax = maxX[order]
+
+    # Candidates of the k-th box are the boxes starting before its end
+    end = np.searchsorted(sortedMin, sortedMax, side="right")
+    counts = end - np.arange(1, count + 1)
+    total = counts.sum()
+    first = np.repeat(np.arange(count), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = first + 1 + offsets
+
+    A = order[first]
+    B = order[second]
+    A, B = np.minimum(A, B), np.maximum(A, B)
+
+    d = position[B] - position[A]
+    r = radius[A] + radius[B]
+    keep = DotVV(d, d) < r * r
+    keep &= (invMass[A] != 0) | (invMass[B] != 0)
+    A = A[keep]
+    B = B[keep]
+
+    order = np.lexsort((B, A))
+    return A[order], B[order]
+
+
+def ColorContacts(A, B, invMass):
+    """
+    Split the contacts in batches where no dynamic body appears twice, so a
+    whole batch can be solved at once like the sequential solver would.
+    Static bodies are never written to and can be shared.
+    """
+    count = len(A)
+    bodyCount = len(invMass)
+    keyA = np.where(invMass[A] == 0, bodyCount, A)
+    keyB = np.where(invMass[B] == 0, bodyCount, B)
+
+    batches = []
+    remaining = np.arange(count)
+    while remaining.size:
+        ka = keyA[remaining]
+        kb = keyB[remaining]
+
+        # First remaining contact touching each body
+        first = np.full(bodyCount + 1, count)
+        np.minimum.at(first, ka, remaining)
+        np.minimum.at(first, kb, remaining)
+
+        selected = ((ka == bodyCount) | (first[ka] == remaining)) & (
+            (kb == bodyCount) | (first[kb] == remaining)
+        )
+        batches.append(remaining[selected])
+        remaining = remaining[~selected]
+
+    return batches
+
+
+def HalfPlaneContacts(position, radius, invMass, normals, offsets):
+    """
+    Contacts of the circles with static half-planes, see common.shape.HalfPlane
+
+    normals : (W, 2) normals pointing to the free side
+    offsets : (W,) Dot(normal, p) on the boundary
+
+    Return the (wall, body) index arrays sorted by wall then body, and the
+    normal, penetration and contact point of each contact
+    """
+    distance = normals @ position.T - offsets[:, None]
+    touching = (distance < radius) & (invMass != 0)
+    wall, body = np.nonzero(touching)
+
+    normal = normals[wall]
+    penetration = radius[body] - distance[wall, body]
+    contact = position[body] - normal * radius[body][:, None]
+    return wall, body, normal, penetration, contact
+
+
+def CircleGeometry(s: BodyArrays, A, B):
+    """
+    Normal, penetration and contact point of touching circles A and B
+    """
+    normal = s.position[B] - s.position[A]
+    distance = np.sqrt(DotVV(normal, normal))
+    radiusA = s.radius[A]
+
+    coincident = distance == 0.0
+    safeDistance = np.where(coincident, 1.0, distance)
+    normal = np.where(coincident[:, None], (1.0, 0.0), normal / safeDistance[:, None])
+    penetration = np.where(coincident, radiusA, radiusA + s.radius[B] - distance)
+    contact = s.position[A] + np.where(
+        coincident[:, None], 0.0, normal * radiusA[:, None]
+    )
+    return normal, penetration, contact
+
+
+class ContactBatch:
+    """
+    Circle to circle contacts, solved together like a list of Manifold.
+
+    The normal, penetration and contact point of each contact can be given,
+    for the contacts with other shapes
+    """
+
+    def __init__(
+        self, s: BodyArrays, A, B, normal=None, penetration=None, contact=None
+    ):
+        self.A = A
+        self.B = B
+        if normal is None:
+            normal, penetration, contact = CircleGeometry(s, A, B)
+        self.normal = normal
+        self.penetration = penetration
+        self.contact = contact
+
+        self.batches = ColorContacts(A, B, s.invMass)
+
+    def __len__(self):
+        return len(self.A)
+
+    def Initialize(self, s: BodyArrays, dt, gravity):
+        A = self.A
+        B = self.B
+
+        # Calculate average restitution
+        self.e = np.minimum(s.restitution[A], s.restitution[B])
+
+        # Calculate static and dynamic friction
+        self.sf = np.sqrt(s.staticFriction[A] * s.staticFriction[B])
+        self.df = np.sqrt(s.dynamicFriction[A] * s.dynamicFriction[B])
+
+        # Radii from COM to contact, positions do not move while solving
+        self.ra = self.contact - s.position[A]
+        self.rb = self.contact - s.position[B]
+
+        rv = (
+            s.velocity[B]
+            + CrossSV(s.angularVelocity[B], self.rb)
+            - s.velocity[A]
+            - CrossSV(s.angularVelocity[A], self.ra)
+        )
+        g = gravity * dt
+        resting = DotVV(rv, rv) < g[0] * g[0] + g[1] * g[1] + EPSILON
+        self.e[resting] = 0.0
+
+        raCrossN = CrossVV(self.ra, self.normal)
+        rbCrossN = CrossVV(self.rb, self.normal)
+        self.invMassSum = (
+            s.invMass[A]
+            + s.invMass[B]
+            + raCrossN * raCrossN * s.invInertia[A]
+            + rbCrossN * rbCrossN * s.invInertia[B]
+        )
+
+    def ApplyImpulse(self, s: BodyArrays):
+        for batch in self.batches:
+            A = self.A[batch]
+            B = self.B[batch]
+            n = self.normal[batch]
+            ra = self.ra[batch]
+            rb = self.rb[batch]
+            invMassSum = self.invMassSum[batch]
+            invMassA = s.invMass[A][:, None]
+            invMassB = s.invMass[B][:, None]
+            invInertiaA = s.invInertia[A]
+            invInertiaB = s.invInertia[B]
+
+            vA = s.velocity[A]
+            vB = s.velocity[B]
+            wA = s.angularVelocity[A]
+            wB = s.angularVelocity[B]
+
+            # Relative velocity along the normal
+            rv = vB + CrossSV(wB, rb) - vA - CrossSV(wA, ra)
+            contactVel = DotVV(rv, n)
+
+            # Do not resolve if velocities are separating
+            approaching = contactVel <= 0
+
+            # Calculate impulse scalar
+            j = -(1 + self.e[batch]) * contactVel / invMassSum
+            j = np.where(approaching, j, 0.0)
+
+            # Apply impulse
+            impulse = n * j[:, None]
+            vA = vA - impulse * invMassA
+            wA = wA - invInertiaA * CrossVV(ra, impulse)
+            vB = vB + impulse * invMassB
+            wB = wB + invInertiaB * CrossVV(rb, impulse)
+
+            # Friction impulse
+            rv = vB + CrossSV(wB, rb) - vA - CrossSV(wA, ra)
+            t = rv - n * DotVV(rv, n)[:, None]
+            length = np.sqrt(DotVV(t, t))
+            t = np.where(
+                (length > EPSILON)[:, None],
+                t / np.maximum(length, EPSILON)[:, None],
+                t,
+            )
+
+            # j tangent magnitude
+            jt = -DotVV(rv, t) / invMassSum
+
+            # Don't apply tiny friction impulses
+            jt = np.where(approaching & (np.abs(jt) >= EPSILON), jt, 0.0)
+
+            # Coulumb's law
+            jt = np.where(np.abs(jt) < j * self.sf[batch], jt, -j * self.df[batch])
+            jt = np.where(approaching, jt, 0.0)
+
+            # Apply friction impulse
+            tangentImpulse = t * jt[:, None]
+            vA = vA - tangentImpulse * invMassA
+            wA = wA - invInertiaA * CrossVV(ra, tangentImpulse)
+            vB = vB + tangentImpulse * invMassB
+            wB = wB + invInertiaB * CrossVV(rb, tangentImpulse)
+
+            s.velocity[A] = vA
+            s.velocity[B] = vB
+            s.angularVelocity[A] = wA
+            s.angularVelocity[B] = wB
+
+    def PositionalCorrection(self, s: BodyArrays):
+        k_slop = 0.05
+        percent = 0.4
+        invMassA = s.invMass[self.A]
+        invMassB = s.invMass[self.B]
+        correction = (
+            np.maximum(self.penetration - k_slop, 0.0)
+            / (invMassA + invMassB)
+            * percent
+        )[:, None] * self.normal
+        np.subtract.at(s.position, self.A, correction * invMassA[:, None])
+        np.add.at(s.position, self.B, correction * invMassB[:, None])
+
+
+def IntegrateForces(s: BodyArrays, gravity, dt, active=None):
+    """
+    Only the bodies of the mask active move, all of them by default. The
+    forces of the others must be cleared.
+    """
+    dynamic = s.invMass != 0.0
+    if active is not None:
+        dynamic &= active
+    dynamic = dynamic[:, None]
+    s.velocity += (s.force * s.invMass[:, None] + gravity * dynamic) * (dt / 2.0)
+    s.angularVelocity += s.torque * s.invInertia * (dt / 2.0)
+
+
+def IntegrateVelocity(s: BodyArrays, gravity, dt, active=None):
+    dynamic = s.invMass != 0.0
+    if active is not None:
+        dynamic &= active
+    s.position += s.velocity * (dt * dynamic)[:, None]
+    s.orientation += s.angularVelocity * (dt * dynamic)
+    IntegrateForces(s, gravity, dt, active)
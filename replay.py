@@ -0,0 +1,21 @@
+import argparse
+import sys
+import time
+from game_engine.replay import Replay
+
+parser = argparse.ArgumentParser(
+    description="Re-simulate a replay log without display and check its state hashes"
+)
+parser.add_argument("log")
+parser.add_argument("--no-verify", action="store_true")
+args = parser.parse_args()
+
+start = time.perf_counter()
+world, mismatch = Replay(args.log, not args.no_verify)
+elapsed = time.perf_counter() - start
+
+print("{} bodies, score {}, {:.2f}s".format(len(world.bodies), world.score, elapsed))
+if mismatch is not None:
+    print("state hash mismatch at step {}".format(mismatch))
+    sys.exit(1)
+print("replay OK")
@@ -0,0 +1,21 @@
+from common.math import Vec2
+from common.shape import Circle
+from game_engine.circleWorld import CircleWorld
+
+
+def test_body_vectors_write_to_the_arrays():
+    world = CircleWorld(1.0 / 60.0, 10, capacity=1, seed=0)
+    body = world.add(Circle(10), 100, 200)
+    position = body.position
+    # Reallocates the arrays, the view follows
+    world.add(Circle(10), 300, 200)
+
+    position.AddScaled(Vec2(1.0, 2.0), 3.0)
+    body.velocity.Set(4.0, 5.0)
+    assert tuple(world.arrays.position[0]) == (103.0, 206.0)
+    assert tuple(world.arrays.velocity[0]) == (4.0, 5.0)
+
+    copy = body.position + Vec2(0.0, 0.0)
+    world.step()
+    assert (copy.x, copy.y) == (103.0, 206.0)
+    assert body.position.x != copy.x
@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+from game_engine.experienceStore import ExperienceStore
+
+
+def test_sample_without_complete_slots(tmp_path):
+    store = ExperienceStore.Create(str(tmp_path), 8, (2,), seed=0)
+    # Slots reserved by a writer killed before completing them
+    store.head[0] = 3
+    with pytest.raises(ValueError):
+        store.Sample(4)
+    with pytest.raises(ValueError):
+        store.SamplePrioritized(4)
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run headless.py as __main__, then fail if it imported pygame
+SCRIPT = """
+import runpy, sys
+sys.argv = ["headless.py", "--steps", "20", "--bodies", "10", "--sleep"]
+runpy.run_path("headless.py", run_name="__main__")
+if "pygame" in sys.modules:
+    sys.exit("the headless run imported pygame")
+"""
+
+
+def test_headless_does_not_import_pygame():
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "20 steps" in result.stdout
@@ -0,0 +1,27 @@
+from common.math import Vec2
+from common.shape import Circle, Polygon
+from game_engine.replay import Replay, ReplayRecorder
+from game_engine.world import World
+from physic_engine.broadphase import SweepAndPrune
+
+
+def test_replay_verifies_polygons(tmp_path):
+    path = str(tmp_path / "polygons.replay")
+    world = World(1.0 / 60.0, 10, SweepAndPrune(), seed=7)
+    with ReplayRecorder(world, path) as recorder:
+        recorder.add_container(800, 600)
+        box = Polygon()
+        box.SetBox(20, 12)
+        recorder.add(box, 300, 400)
+        for step in range(120):
+            if step == 10:
+                triangle = Polygon()
+                triangle.Set([Vec2(-15, 15), Vec2(15, 15), Vec2(0, -15)], 3)
+                recorder.add(triangle, 310, 200)
+            if step == 20:
+                recorder.add(Circle(10), 330, 100)
+            recorder.step()
+
+    replayed, mismatch = Replay(path)
+    assert mismatch is None
+    assert len(replayed.bodies) == 3
@@ -0,0 +1,34 @@
+import math
+from game_engine.rollout import RolloutRunner, _Env
+
+CONFIG = {
+    "dt": 1.0 / 60.0,
+    "iterations": 10,
+    "maxBodies": 64,
+    "width": 800,
+    "height": 600,
+    "dropY": 50,
+}
+
+
+def test_merge_rewards():
+    env = _Env(0, CONFIG)
+    rewards = []
+    for step in range(600):
+        action = math.nan
+        if step in (0, 60):
+            env.nextTier = 0
+            action = 400.0
+        rewards.append(env.Step(action))
+    assert sum(rewards) > 0
+    assert len(env.world.get_bodies()) == 1
+    assert not env.done
+
+
+def test_runner_steps():
+    with RolloutRunner(2, 2) as runner:
+        runner.reset(range(2))
+        observations, rewards, dones = runner.step([300.0, math.nan])
+        assert observations[0, 0, 0] == 300.0
+        assert not observations[1].any()
+        assert not dones.any()
@@ -0,0 +1,123 @@
+from operator import attrgetter
+import numpy as np
+from common.shape import CIRCLE
+from game_engine.fruit import FRUITS
+
+_x = attrgetter("position.x")
+_y = attrgetter("position.y")
+_radius = attrgetter("shape.radius")
+
+
+def _Tier(body):
+    return -1 if body.tier is None else body.tier
+
+
+class Rasterizer:
+    """
+    Offscreen renderer for pixel observations, without display nor pygame.
+
+    The circles of a batch of worlds are rasterized together into frames, a
+    uint8 array of shape (batch, channels, rows, cols) allocated once and
+    overwritten at each call, copy it to keep it. A world of width x height
+    is scaled down to resolution = (cols, rows). Channel t holds the fruits
+    of FRUITS[t], the last channel the bodies that are not fruits. A pixel is
+    255 when its center is inside a circle, the center pixel of a circle is
+    always set so that small circles do not vanish.
+    """
+
+    channels = len(FRUITS) + 1
+
+    def __init__(self, batch=1, width=800, height=600, resolution=(80, 60)):
+        self.batch = batch
+        self.width = width
+        self.height = height
+        self.cols, self.rows = resolution
+        self.scale = np.array((self.cols / width, self.rows / height))
+        self.frames = np.zeros(
+            (batch, self.channels, self.rows, self.cols), dtype=np.uint8
+        )
+
+    def rasterize(self, position, radius, tier, mask=None):
+        """
+        position (B, M, 2), radius (B, M) and tier (B, M) of M bodies in each
+        of B worlds, tier -1 for the bodies that are not fruits. Only the
+        bodies of mask are drawn, by default the ones of positive radius.
+
+        Return the B first frames
+        """
+        position = np.asarray(position, dtype=float)
+        radius = np.asarray(radius, dtype=float)
+        tier = np.asarray(tier).astype(np.intp, copy=False)
+        if mask is None:
+            mask = radius > 0
+        count = radius.shape[0]
+        if count > self.batch:
+            raise ValueError(
+                "{} worlds for a batch of {} frames".format(count, self.batch)
+            )
+
+        frames = self.frames[:count]
+        frames[:] = 0
+        world, body = np.nonzero(mask)
+        if not world.size:
+            return frames
+
+        center = position[world, body] * self.scale
+        extent = radius[world, body, None] * self.scale
+        channel = tier[world, body]
+        channel = np.where(channel >= 0, channel, self.channels - 1)
+
+        # Pixels of a square patch around each center, inside the ellipse the
+        # circle becomes when the two axes are not scaled the same
+        size = int(np.ceil(extent.max()))
+        offsets = np.arange(-size, size + 1)
+        pixel = np.floor(center).astype(np.intp)
+        px = pixel[:, 0, None] + offsets
+        py = pixel[:, 1, None] + offsets
+        dx = (px + 0.5 - center[:, 0, None]) / extent[:, 0, None]
+        dy = (py + 0.5 - center[:, 1, None]) / extent[:, 1, None]
+        inside = dy[:, :, None] ** 2 + dx[:, None, :] ** 2 <= 1.0
+        inside[:, size, size] = True
+        inside &= ((py >= 0) & (py < self.rows))[:, :, None]
+        inside &= ((px >= 0) & (px < self.cols))[:, None, :]
+
+        n, j, i = np.nonzero(inside)
+        frames[world[n], channel[n], py[n, j], px[n, i]] = 255
+        return frames
+
+    def render_worlds(self, worlds):
+        """
+        Frames of a list of Worlds holding only circles, the walls are not
+        drawn
+        """
+        size = max([len(world.get_bodies()) for world in worlds] + [0])
+        position = np.zeros((len(worlds), size, 2))
+        radius = np.zeros((len(worlds), size))
+        tier = np.full((len(worlds), size), -1)
+        for w, world in enumerate(worlds):
+            bodies = world.get_bodies()
+            count = len(bodies)
+            for body in bodies:
+                if body.shape.typeId != CIRCLE:
+                    raise ValueError("Rasterizer only supports circles")
+            position[w, :count, 0] = np.fromiter(map(_x, bodies), float, count)
+            position[w, :count, 1] = np.fromiter(map(_y, bodies), float, count)
+            radius[w, :count] = np.fromiter(map(_radius, bodies), float, count)
+            tier[w, :count] = np.fromiter(map(_Tier, bodies), int, count)
+        return self.rasterize(position, radius, tier)
+
+    def render_batch_world(self, batchWorld):
+        """
+        Frames of the worlds of a BatchWorld, its circles are not fruits
+        """
+        tier = np.full(batchWorld.alive.shape, -1)
+        return self.rasterize(
+            batchWorld.position, batchWorld.radii, tier, batchWorld.alive
+        )
+
+    def render_observations(self, bodies, mask):
+        """
+        Frames of stacked SuikaEnv observations, bodies (B, M, 6) and
+        mask (B, M)
+        """
+        return self.rasterize(bodies[..., 0:2], bodies[..., 4], bodies[..., 5], mask)
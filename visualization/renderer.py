@@ -1,32 +1,351 @@
 import pygame as pg
 import math
+import time
+from collections import deque
 from common.math import *
 from common.shape import *
+from game_engine.stats import StepStats
 from physic_engine.body import *
 
+BACKGROUND = (0, 0, 0)
+
+# Orientations of the pre-rendered circle sprites per turn
+ORIENTATION_STEPS = 64
+
+
+def DrawCircle(screen, shape: Circle):
+    body = shape.body
+    DrawCircleAt(
+        screen, shape.radius, body.position.x, body.position.y, body.orientation
+    )
+
+
+def DrawCircleAt(screen, radius, x, y, orientation):
+    # Draw the outline of the circle
+    pg.draw.circle(screen, (255, 255, 255), (x, y), radius, 1)  # 1 pixel outline
+
+    # Draw the orientation line
+    end_x = x + radius * math.cos(orientation)
+    end_y = y + radius * math.sin(orientation)
+    pg.draw.line(screen, (255, 0, 0), (x, y), (end_x, end_y), 1)
+
+
+def DrawPolygon(screen, shape: Polygon):
+    shape.UpdateWorldGeometry()
+    vertices = shape.worldVertices
+    points = [(vertices[i], vertices[i + 1]) for i in range(0, len(vertices), 2)]
+    pg.draw.polygon(screen, (255, 255, 255), points, 1)
+
+
+def PolygonPoints(geometry: PolygonGeometry, x, y, orientation):
+    """
+    World space vertices of a polygon geometry at a pose
+    """
+    c = math.cos(orientation)
+    s = math.sin(orientation)
+    vertices = geometry.vertices
+    points = []
+    for i in range(0, len(vertices), 2):
+        vx = vertices[i]
+        vy = vertices[i + 1]
+        points.append((c * vx - s * vy + x, s * vx + c * vy + y))
+    return points
+
+
+def DrawPolygonAt(screen, geometry: PolygonGeometry, x, y, orientation):
+    points = PolygonPoints(geometry, x, y, orientation)
+    pg.draw.polygon(screen, (255, 255, 255), points, 1)
+
+
+def DrawHalfPlane(screen, shape: HalfPlane):
+    # The boundary line across the whole screen
+    position = shape.body.position
+    length = screen.get_width() + screen.get_height()
+    tx = -shape.normal.y * length
+    ty = shape.normal.x * length
+    pg.draw.line(
+        screen,
+        (255, 255, 255),
+        (position.x - tx, position.y - ty),
+        (position.x + tx, position.y + ty),
+        1,
+    )
+
+
+# Drawing of a shape from its body, indexed by the shape type ids like
+# collision_dispatch_table
+draw_dispatch_table = [DrawCircle, DrawPolygon, DrawHalfPlane]
+
+# Drawing at a pose, from the size of WorldPoses
+draw_pose_dispatch_table = [DrawCircleAt, DrawPolygonAt]
+
+
+def WorldPoses(world):
+    """
+    (body, typeId, size, x, y, orientation) of the bodies of a world, size is
+    the radius of a circle or the geometry of a polygon
+    """
+    for body in world.get_bodies():
+        shape = body.shape
+        size = shape.radius if shape.typeId == CIRCLE else shape.geometry
+        position = body.position
+        yield body, shape.typeId, size, position.x, position.y, body.orientation
+
+
+def CircleSprite(radius, orientation, outline, line, key):
+    """
+    Same drawing as DrawCircle around the center of a surface of even size,
+    the pixels of color key are transparent
+    """
+    half = int(math.ceil(radius)) + 1
+    sprite = pg.Surface((2 * half, 2 * half))
+    sprite.fill(key)
+    sprite.set_colorkey(key, pg.RLEACCEL)
+    pg.draw.circle(sprite, outline, (half, half), radius, 1)
+    end = (half + radius * math.cos(orientation), half + radius * math.sin(orientation))
+    pg.draw.line(sprite, line, (half, half), end, 1)
+    return sprite
+
 
 class Renderer:
-    def __init__(self, world, width, height):
+    """
+    Draws the world on the display, clearing and redrawing everything each
+    frame.
+
+    With dirtyRects, the circles are blitted from sprites pre-rendered per
+    radius and orientation step, and only the regions of the bodies that
+    moved, appeared or disappeared are redrawn and sent to the display with
+    pg.display.update(rects). Polygons keep the primitive drawing.
+    """
+
+    def __init__(self, world, width, height, dirtyRects=False):
         pg.init()
         self.world = world
         self.width = width
         self.height = height
+        self.dirtyRects = dirtyRects
         self.screen = pg.display.set_mode((width, height))
         pg.display.set_caption("2D physic engine")
 
-    def draw_objects(self):
-        self.screen.fill((0, 0, 0))
-        bodies = self.world.get_bodies()
-        for body in bodies:
-            body.shape.Draw(self.screen)
+        self.font = pg.font.Font(None, 20)
+        self.glyphs = {}
+        self.sprites = {}
+
+        # What is on the screen in dirty rects mode,
+        # body -> (rect, sprite or polygon points, eraser)
+        self.drawn = {}
+        self.panelRect = None
+        self.fullRedraw = True
+
+        self.frameTimes = deque(maxlen=120)
+
+    def draw_objects(self, poses=None):
+        """
+        poses as given by WorldPoses, the bodies of the world by default
+        """
+        self.screen.fill(BACKGROUND)
+        if poses is None:
+            poses = WorldPoses(self.world)
+        for body, typeId, size, x, y, orientation in poses:
+            draw_pose_dispatch_table[typeId](self.screen, size, x, y, orientation)
+        for wall in getattr(self.world, "walls", ()):
+            draw_dispatch_table[wall.shape.typeId](self.screen, wall.shape)
+
+    def sprite(self, radius, orientation):
+        """
+        The sprite of a circle and its eraser, the same pixels in the
+        background color
+        """
+        step = round(orientation * ORIENTATION_STEPS / (2.0 * PI)) % ORIENTATION_STEPS
+        key = (radius, step)
+        sprites = self.sprites.get(key)
+        if sprites is None:
+            angle = step * 2.0 * PI / ORIENTATION_STEPS
+            sprite = CircleSprite(
+                radius, angle, (255, 255, 255), (255, 0, 0), BACKGROUND
+            )
+            eraser = CircleSprite(radius, angle, BACKGROUND, BACKGROUND, (255, 0, 255))
+            sprites = self.sprites[key] = (sprite, eraser)
+        return sprites
+
+    def draw_dirty(self, poses=None, state=None):
+        """
+        Redraw the regions that changed since the last frame, return them.
+        poses as given by WorldPoses, the bodies of the world by default,
+        state for the control panel, see controlPanelLines.
+        """
+        if poses is None:
+            poses = WorldPoses(self.world)
+        screen = self.screen
+        previous = self.drawn
+        drawn = {}
+        dirty = []
+
+        # The outlines are thin, erasing a circle by blitting its eraser
+        # touches much fewer pixels than filling its rect
+        erased = []
+        for body, typeId, size, x, y, orientation in poses:
+            if typeId == CIRCLE:
+                key, eraser = self.sprite(size, orientation)
+                half = key.get_width() // 2
+                rect = key.get_rect(topleft=(round(x) - half, round(y) - half))
+            else:
+                key = PolygonPoints(size, x, y, orientation)
+                eraser = None
+                xs = [point[0] for point in key]
+                ys = [point[1] for point in key]
+                minX = min(xs)
+                minY = min(ys)
+                width = max(xs) - minX + 3
+                height = max(ys) - minY + 3
+                rect = pg.Rect(minX - 1, minY - 1, width, height)
+            drawn[body] = (rect, key, eraser)
+
+            old = previous.pop(body, None)
+            if old is None:
+                dirty.append(rect)
+            elif old[1] != key or old[0] != rect:
+                dirty.append(rect)
+                dirty.append(old[0])
+                erased.append(old)
+
+        # Bodies that were removed
+        for old in previous.values():
+            dirty.append(old[0])
+            erased.append(old)
 
-    def renderControlPanel(self):
-        font = pg.font.Font(None, 20)
-        text = font.render("text", True, (255, 255, 255))
-        self.screen.blit(text, (0, 0))
+        lines = self.controlPanelLines(state) if self.world.debugMode else []
+        filled = []
+        panelRect = None
+        if lines:
+            width = max(self.textWidth(line) for line in lines)
+            panelRect = pg.Rect(0, 0, width, len(lines) * self.font.get_linesize())
+            filled.append(panelRect)
+        if self.panelRect is not None:
+            filled.append(self.panelRect)
+        self.panelRect = panelRect
+        dirty += filled
+
+        # Past half the screen, one fill and one update are cheaper
+        area = 0
+        for rect in dirty:
+            area += rect.w * rect.h
+        if self.fullRedraw or 2 * area > self.width * self.height:
+            dirty = [screen.get_rect()]
+            filled = dirty
+            erased = []
+            self.fullRedraw = False
+
+        for rect, key, eraser in erased:
+            if eraser is None:
+                screen.fill(BACKGROUND, rect)
+            else:
+                screen.blit(eraser, rect)
+        for rect in filled:
+            screen.fill(BACKGROUND, rect)
+        for body, (rect, key, eraser) in drawn.items():
+            if rect.collidelist(dirty) < 0:
+                continue
+            if eraser is not None:
+                screen.blit(key, rect)
+            else:
+                pg.draw.polygon(screen, (255, 255, 255), key, 1)
+        for wall in getattr(self.world, "walls", ()):
+            draw_dispatch_table[wall.shape.typeId](screen, wall.shape)
+        self.drawText(lines)
+
+        self.drawn = drawn
+        return dirty
+
+    def glyph(self, char):
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            glyph = self.font.render(char, True, (255, 255, 255))
+            self.glyphs[char] = glyph
+        return glyph
+
+    def textWidth(self, line):
+        return sum(self.glyph(char).get_width() for char in line)
+
+    def drawText(self, lines):
+        """
+        Blit the lines from the top left corner with the cached glyphs
+        """
+        y = 0
+        for line in lines:
+            x = 0
+            for char in line:
+                glyph = self.glyph(char)
+                self.screen.blit(glyph, (x, y))
+                x += glyph.get_width()
+            y += self.font.get_linesize()
+
+    def controlPanelLines(self, state=None):
+        """
+        From the world, or from a RenderState of PhysicsThread when given
+        """
+        if state is None:
+            lines = [
+                "{} bodies, score {}".format(
+                    len(self.world.get_bodies()), self.world.score
+                )
+            ]
+            stats = getattr(self.world, "stats", None)
+            summary = stats.Summary() if stats is not None else None
+        else:
+            lines = [
+                "{} bodies, score {}, step {}, {:.2f}s dropped".format(
+                    len(state.bodies), state.score, state.step, state.droppedTime
+                )
+            ]
+            summary = state.statsSummary
+        if summary is not None:
+            lines += summary
+        else:
+            lines.append("no step stats, create the world with stats=StepStats()")
+        lines.append(
+            "frame p50 {:6.2f}ms p95 {:6.2f}ms, {}".format(
+                self.FrameTimePercentile(50),
+                self.FrameTimePercentile(95),
+                "dirty rects" if self.dirtyRects else "full redraw",
+            )
+        )
+        return lines
+
+    def renderControlPanel(self, state=None):
+        self.drawText(self.controlPanelLines(state))
+
+    def FrameTimePercentile(self, p) -> float:
+        """
+        p-th percentile of the duration of render_frame or render_state in
+        milliseconds
+        """
+        return 1000.0 * StepStats.Percentile(self.frameTimes, p)
 
     def render_frame(self):
-        self.draw_objects()
-        if self.world.debugMode:
-            self.renderControlPanel()
-        pg.display.flip()
+        start = time.perf_counter()
+        if self.dirtyRects:
+            pg.display.update(self.draw_dirty())
+        else:
+            self.draw_objects()
+            if self.world.debugMode:
+                self.renderControlPanel()
+            pg.display.flip()
+        self.frameTimes.append(time.perf_counter() - start)
+
+    def render_state(self, state, alpha):
+        """
+        Draw a RenderState published by PhysicsThread, alpha in [0, 1] going
+        from the poses before its step to the poses after it. The bodies of
+        the world are not read, the physics thread may be stepping them.
+        """
+        start = time.perf_counter()
+        poses = state.Poses(alpha)
+        if self.dirtyRects:
+            pg.display.update(self.draw_dirty(poses, state))
+        else:
+            self.draw_objects(poses)
+            if self.world.debugMode:
+                self.renderControlPanel(state)
+            pg.display.flip()
+        self.frameTimes.append(time.perf_counter() - start)
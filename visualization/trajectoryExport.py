@@ -0,0 +1,121 @@
+import os
+import shutil
+import subprocess
+from multiprocessing import Pool
+import pygame as pg
+from game_engine.trajectory import TrajectoryReader
+from visualization.renderer import BACKGROUND, DrawCircleAt
+
+# Reader of the worker process, opened once by _InitWorker
+_reader = None
+_size = None
+
+
+def DrawStep(surface, reader: TrajectoryReader, step):
+    """
+    Same drawing as the Renderer, the polygons are drawn as their bounding
+    circle
+    """
+    surface.fill(BACKGROUND)
+    for body in reader.Step(step).tolist():
+        radius, x, y, orientation = body[3:7]
+        DrawCircleAt(surface, radius, x, y, orientation)
+
+    length = surface.get_width() + surface.get_height()
+    for x, y, nx, ny in reader.walls:
+        tx = -ny * length
+        ty = nx * length
+        pg.draw.line(surface, (255, 255, 255), (x - tx, y - ty), (x + tx, y + ty), 1)
+
+
+def _InitWorker(path, size):
+    global _reader, _size
+    _reader = TrajectoryReader(path)
+    _size = size
+
+
+def _SaveFrames(job):
+    """
+    Draw the steps of job and save them as numbered png files
+    """
+    steps, pattern, first = job
+    surface = pg.Surface(_size)
+    for i, step in enumerate(steps):
+        DrawStep(surface, _reader, step)
+        pg.image.save(surface, pattern.format(first + i))
+    return len(steps)
+
+
+def _RawFrames(steps):
+    """
+    Draw the steps and return them as one block of RGB bytes
+    """
+    surface = pg.Surface(_size)
+    frames = []
+    for step in steps:
+        DrawStep(surface, _reader, step)
+        frames.append(pg.image.tobytes(surface, "RGB"))
+    return b"".join(frames)
+
+
+def _Jobs(steps, batch):
+    return [steps[i : i + batch] for i in range(0, len(steps), batch)]
+
+
+def ExportFrames(path, directory, size=(800, 600), every=1, workers=None, batch=32):
+    """
+    Render every every-th step of a trajectory to directory/frame_NNNNNN.png
+    with a pool of workers. Return the number of frames.
+    """
+    os.makedirs(directory, exist_ok=True)
+    pattern = os.path.join(directory, "frame_{:06d}.png")
+    steps = range(0, len(TrajectoryReader(path)), every)
+    jobs = [(chunk, pattern, i * batch) for i, chunk in enumerate(_Jobs(steps, batch))]
+    with Pool(workers, _InitWorker, (path, size)) as pool:
+        return sum(pool.imap_unordered(_SaveFrames, jobs))
+
+
+def ExportVideo(
+    path, video, size=(800, 600), every=1, workers=None, batch=32, fps=None
+):
+    """
+    Render a trajectory to a video with ffmpeg, the frames drawn by a pool
+    of workers are piped to it in order. fps defaults to the real-time rate
+    of the trajectory. Return the number of frames.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is needed to export a video")
+    reader = TrajectoryReader(path)
+    if fps is None:
+        fps = 1.0 / (reader.dt * every)
+    steps = range(0, len(reader), every)
+
+    encoder = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            "{}x{}".format(*size),
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+            "-pix_fmt",
+            "yuv420p",
+            video,
+        ],
+        stdin=subprocess.PIPE,
+    )
+    with Pool(workers, _InitWorker, (path, size)) as pool:
+        for frames in pool.imap(_RawFrames, _Jobs(steps, batch)):
+            encoder.stdin.write(frames)
+    encoder.stdin.close()
+    if encoder.wait() != 0:
+        raise RuntimeError("ffmpeg failed to encode {}".format(video))
+    return len(steps)